@@ -0,0 +1,47 @@
+import io
+import pickle
+from typing import Any, List
+
+
+class NodePickler(pickle.Pickler):
+    """Pickles every reference to one of the nodes as its index, the nodes themselves are pickled separately."""
+
+    def __init__(self, file, nodes: List):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.index_of = {id(node): index for index, node in enumerate(nodes)}
+
+    def persistent_id(self, obj):
+        return self.index_of.get(id(obj))
+
+
+class NodeUnpickler(pickle.Unpickler):
+    def __init__(self, file, nodes: List):
+        super().__init__(file)
+        self.nodes = nodes
+
+    def persistent_load(self, index):
+        return self.nodes[index]
+
+
+def dumps(obj: Any, nodes: List) -> bytes:
+    """Pickles obj, which can refer to the nodes in any way.
+
+    Nodes refer to each other through their messages and routes, pickling them as they are reached would recurse
+    along those chains and run out of stack for large networks. So the state of every node is pickled on its own at
+    the top level, with all references to nodes replaced by their index.
+    """
+    file = io.BytesIO()
+    pickle.dump([type(node) for node in nodes], file, pickle.HIGHEST_PROTOCOL)
+    NodePickler(file, nodes).dump(([node.__dict__ for node in nodes], obj))
+    return file.getvalue()
+
+
+def loads(data: bytes) -> Any:
+    file = io.BytesIO(data)
+    node_types = pickle.load(file)
+    # Empty nodes first, so every reference can be resolved, they get their state after.
+    nodes = [node_type.__new__(node_type) for node_type in node_types]
+    states, obj = NodeUnpickler(file, nodes).load()
+    for node, state in zip(nodes, states):
+        node.__dict__.update(state)
+    return obj
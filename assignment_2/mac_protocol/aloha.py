@@ -27,6 +27,14 @@ class Aloha:
 
         return message
 
+    def next_wakeup(self, node: Host, round_counter):
+        # Sending was postponed because of an incoming message, try again next round.
+        if self.message_send is False:
+            return round_counter + 1
+
+        # Nothing happens until the flag gets reset after the start of our last message.
+        return self.start_time + 2
+
     def send_message(self, node, round_counter):
         message = None
         neigbors = node.get_neighbors()
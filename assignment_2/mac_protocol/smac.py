@@ -35,6 +35,19 @@ class MessageType(Enum):
     DATA = auto()
     ACK = auto()
 
+class SyncHeader:
+    """Schedule carried by a SYNC message, read directly by the receivers instead of parsed from the payload."""
+    __slots__ = ('sleep_period', 'listen_period', 'sync_sleep_wait')
+
+    def __init__(self, sleep_period: int, listen_period: int, sync_sleep_wait: int):
+        self.sleep_period = sleep_period
+        self.listen_period = listen_period
+        self.sync_sleep_wait = sync_sleep_wait
+
+    def __str__(self):
+        return f"{self.sleep_period} {self.listen_period} {self.sync_sleep_wait}"
+
+
 class NodeType(Enum):
     FOLLOWER = auto()
     SYNCHRONIZER = auto()
@@ -71,23 +84,21 @@ class SMAC:
 
     def process_algorithm(self, node: Host, round_counter, incoming_message):
         message = None
-        received_message = None
 
-        if incoming_message:
-            received_message = incoming_message.message.split()
+        # Start of the timeline, after this only state changes are recorded
+        if len(node.plot_schedule) == 0:
+            node.plot_schedule.record(round_counter, self.state.value - 1)
 
-        if self.check_for_sync_schedules(received_message, node, round_counter, incoming_message):
+        if self.check_for_sync_schedules(node, round_counter, incoming_message):
             return message
 
         if self.state == State.INIT:
-            node.plot_schedule.append(0)
             # Wait for other SYNC messages
             self.sync_init_wait = round_counter + random.randint(SYNC_MIN_INIT_WAIT, SYNC_MAX_INIT_WAIT)
-            self.state = State.SYNC_INIT
+            self.set_state(node, round_counter, State.SYNC_INIT)
             return message
 
         elif self.state == State.SYNC_INIT:
-            node.plot_schedule.append(1)
             # No SYNC from other nodes, create a schedule
             if round_counter >= self.sync_init_wait:
                 self.sync_init_wait = None
@@ -98,11 +109,11 @@ class SMAC:
                 sleep_wait = round_counter + random.randint(SYNC_MIN_SLEEP_WAIT, SYNC_MAX_SLEEP_WAIT)
 
                 # Create and broadcast schedule
-                schedule = f"{sleep_period} {listen_period} {sleep_wait}"
-                message = self.send_message(node, round_counter, MessageType.SYNC, schedule)
+                header = SyncHeader(sleep_period, listen_period, sleep_wait)
+                message = self.send_message(node, round_counter, MessageType.SYNC, "", header=header)
 
                 # Update own state
-                self.state = State.SYNC_SCHEDULE
+                self.set_state(node, round_counter, State.SYNC_SCHEDULE)
                 self.node_type = NodeType.SYNCHRONIZER
 
                 schedule = {'sleep_period': sleep_period, 'listen_period': listen_period,
@@ -115,7 +126,6 @@ class SMAC:
 
 
         elif self.state == State.SYNC_SCHEDULE:
-            node.plot_schedule.append(2)
             merged_start_time = -1
 
             for key, schedule in self.schedule_table.items():
@@ -126,21 +136,19 @@ class SMAC:
                     merged_start_time = schedule['sync_sleep_wait']
 
             if round_counter >= merged_start_time:
-                self.state = State.SLEEP
+                self.set_state(node, round_counter, State.SLEEP)
 
             return message
 
         elif self.state == State.SLEEP:
-            node.plot_schedule.append(3)
             for key, schedule in self.schedule_table.items():
                 if round_counter >= schedule['next_listen_period']:
                     self.schedule_table[key]['next_sleep_period'] = round_counter + schedule['listen_period']
-                    self.state = State.LISTEN
+                    self.set_state(node, round_counter, State.LISTEN)
 
             return message
 
         elif self.state == State.LISTEN:
-            node.plot_schedule.append(4)
             active_node = False
 
             for key, schedule in self.schedule_table.items():
@@ -152,7 +160,7 @@ class SMAC:
                     active_node = True
 
             if not active_node:
-                self.state = State.SLEEP
+                self.set_state(node, round_counter, State.SLEEP)
 
             # Generate new message by sending a RTS packet if we have nothing to do
             if not incoming_message:
@@ -163,19 +171,19 @@ class SMAC:
 
             # Check for RTS packet
             if incoming_message:
-                if received_message[0] == "RTS":
+                if incoming_message.message_type is MessageType.RTS:
                     message = self.send_message(node, round_counter, MessageType.CTS, "", destination_mac=incoming_message.source)
                     return message
 
             # Check for CTS packet
             if incoming_message:
-                if received_message[0] == "CTS":
+                if incoming_message.message_type is MessageType.CTS:
                     message = self.send_message(node, round_counter, MessageType.DATA, "RANDOM BINARY DATA", destination_mac=incoming_message.source)
                     return message
 
             # Check for DATA packet
             if incoming_message:
-                if received_message[0] == "DATA":
+                if incoming_message.message_type is MessageType.DATA:
                     message = self.send_message(node, round_counter, MessageType.ACK, "", destination_mac=incoming_message.source)
                     return message
 
@@ -185,7 +193,32 @@ class SMAC:
 
         return message
 
-    def send_message(self, node: Host, round_counter: int,  message_type: MessageType, payload: str, destination_mac=None):
+    def set_state(self, node: Host, round_counter: int, state: State):
+        # The new state takes effect from the next round on.
+        self.state = state
+        node.plot_schedule.record(round_counter + 1, state.value - 1)
+
+    def next_wakeup(self, node: Host, round_counter):
+        """First round in which something can happen without a message arriving.
+
+        Only a listening node does something every round, it may start a new message. In the other states the node
+        just waits for a timer, a SYNC message that changes the schedules wakes the node up through the delivery.
+        """
+        if self.state == State.SYNC_INIT:
+            return self.sync_init_wait
+
+        elif self.state == State.SYNC_SCHEDULE:
+            return min((schedule['sync_sleep_wait'] for schedule in self.schedule_table.values()),
+                       default=round_counter + 1)
+
+        elif self.state == State.SLEEP:
+            return min((schedule['next_listen_period'] for schedule in self.schedule_table.values()),
+                       default=round_counter + 1)
+
+        return round_counter + 1
+
+    def send_message(self, node: Host, round_counter: int,  message_type: MessageType, payload: str, destination_mac=None,
+                     header: SyncHeader = None):
         message = None
         neighbors = node.get_neighbors()
 
@@ -202,22 +235,22 @@ class SMAC:
         if message_type == MessageType.SYNC:
             # Broadcast SYNC to all neighbours
             if len(neighbors) > 0:
-                message = Message(node.mac, -1, start_time, end_time, f"{message_type.name} {payload}")
+                message = Message(node.mac, -1, start_time, end_time, payload, message_type, header)
         elif message_type == MessageType.RTS:
             if round_counter >= self.next_available_round:
                 if len(neighbors) > 0:
                     random_neighbour = random.randint(0, len(neighbors) - 1)
                     destination = neighbors[random_neighbour].mac
-                    message = Message(node.mac, destination, start_time, end_time, f"{message_type.name} {payload}")
+                    message = Message(node.mac, destination, start_time, end_time, payload, message_type, header)
         elif message_type == MessageType.CTS:
             if round_counter >= self.next_available_round:
-                message = Message(node.mac, destination_mac, start_time, end_time, f"{message_type.name} {payload}")
+                message = Message(node.mac, destination_mac, start_time, end_time, payload, message_type, header)
         elif message_type == MessageType.DATA:
             if round_counter >= self.next_available_round:
-                message = Message(node.mac, destination_mac, start_time, end_time, f"{message_type.name} {payload}")
+                message = Message(node.mac, destination_mac, start_time, end_time, payload, message_type, header)
         elif message_type == MessageType.ACK:
             if round_counter >= self.next_available_round:
-                message = Message(node.mac, destination_mac, start_time, end_time, f"{message_type.name} {payload}")
+                message = Message(node.mac, destination_mac, start_time, end_time, payload, message_type, header)
 
         # Set next available round to the endtime of the current transmission
         self.next_available_round = end_time
@@ -228,17 +261,18 @@ class SMAC:
     def get_random_wait():
         return abs(round(random.gauss(MEAN_WAIT, STD_WAIT)))
 
-    def check_for_sync_schedules(self, received_message, node, round_counter, incoming_message):
+    def check_for_sync_schedules(self, node, round_counter, incoming_message):
         if incoming_message:
-            if received_message[0] == "SYNC":
-                sleep_period = int(received_message[1])
-                listen_period = int(received_message[2])
-                sync_sleep_wait = int(received_message[3])
+            if incoming_message.message_type is MessageType.SYNC:
+                header = incoming_message.header
+                sleep_period = header.sleep_period
+                listen_period = header.listen_period
+                sync_sleep_wait = header.sync_sleep_wait
 
                 if round_counter <= sync_sleep_wait:
 
                         if self.state == State.SYNC_INIT:
-                            self.state = State.SYNC_SCHEDULE
+                            self.set_state(node, round_counter, State.SYNC_SCHEDULE)
 
                         self.node_type = NodeType.FOLLOWER
 
@@ -1,11 +1,11 @@
-import random
 import time
 from matplotlib import pyplot as plt
 
 from mac_protocol.aloha import Aloha
-from mac_protocol.smac import SMAC
-from network.host import Host
+from result_store import ResultStore
 from simulator import simulator
+from stats import summarize_replicas
+from sweep import build_nodes, generate_layout, run_sweep
 
 
 def main():
@@ -15,8 +15,9 @@ def main():
     nodes = configure_nodes(20, ranges=[800, 800], radius_node=[100, 200], message_length=10,
                             send_freq_interval=[100, 200])
 
-    # Simulator is started here with a large timeout
-    sim = simulator(nodes, 10000)
+    # Simulator is started here with a large timeout, sleeping nodes are skipped until they wake up.
+    # Pass profiler=PhaseProfiler() (from profiler) to get a breakdown of where the time goes.
+    sim = simulator(nodes, 10000, event_driven=True)
 
     started_calc = time.time()
     sim.begin_loop()
@@ -31,23 +32,26 @@ def main():
 
     #plot_throughput()
     #plot_data_rate()
-def plot_throughput():
+def plot_throughput(seeds=(2,), workers=None, results_path="results.sqlite"):
     plot_range = range(3, 30)
-    failed_percentage = []
 
+    # Every point uses the first nodes of the same layout, so it only has to be generated once.
+    layout = generate_layout(max(plot_range), ranges=[800, 800], radius_node=[100, 200])
+    points = [{'number_of_nodes': number_of_nodes, 'protocol': 'smac', 'message_length': 10,
+               'send_freq_interval': [100, 200], 'timeout': 10000} for number_of_nodes in plot_range]
 
-    for number_of_nodes in plot_range:
-        nodes = configure_nodes(number_of_nodes, ranges=[800, 800], radius_node=[100, 200], message_length=10,
-                                send_freq_interval=[100, 200])
+    # Points that were already simulated with the current code are loaded from the results store.
+    store = ResultStore(results_path) if results_path is not None else None
+    started_calc = time.time()
+    try:
+        results = run_sweep(points, layout, seeds, workers, store)
+    finally:
+        if store is not None:
+            store.close()
+    ended_calc = time.time()
+    print(f"Calculation time {format(ended_calc - started_calc, '.4f')}")
 
-        # Simulator is started here with a large timeout
-        sim = simulator(nodes, 10000)
-        started_calc = time.time()
-        sim.begin_loop()
-        ended_calc = time.time()
-        print(f"Calculation time {format(ended_calc - started_calc, '.4f')}")
-        stats = sim.get_stats()
-        failed_percentage.append(stats['failed_percentage'])
+    failed_percentage = [summarize_replicas(point_stats)['mean']['failed_percentage'] for point_stats in results]
 
     plt.figure()
     plt.plot(plot_range, failed_percentage)
@@ -56,28 +60,25 @@ def plot_throughput():
     plt.title('Node collisions')
     plt.show()
 
-def plot_data_rate():
+def plot_data_rate(seeds=(2,), workers=None, results_path="results.sqlite"):
     plot_range = range(1,100)
-    failed_percentage = []
 
-    freq_interval = []
-    for freq in plot_range:
-        send_freq_interval: [int, int] = [150-freq, 250-freq]
-        nodes = configure_nodes(10, ranges=[200, 200], radius_node=[50, 200], message_length=10,
-                                send_freq_interval=send_freq_interval)
+    layout = generate_layout(10, ranges=[200, 200], radius_node=[50, 200])
+    points = [{'number_of_nodes': 10, 'protocol': 'smac', 'message_length': 10,
+               'send_freq_interval': [150-freq, 250-freq], 'timeout': 10000} for freq in plot_range]
 
-        print("send freq interval from " + str(send_freq_interval[0]) + " to " + str(send_freq_interval[1]))
-
-        # Simulator is started here with a large timeout
-        sim = simulator(nodes, 10000)
-        started_calc = time.time()
-        sim.begin_loop()
-        ended_calc = time.time()
-        print(f"Calculation time {format(ended_calc - started_calc, '.4f')}")
-        stats = sim.get_stats()
-        failed_percentage.append(stats['failed_percentage'])
-        freq_interval.append(250-freq)
+    # Points that were already simulated with the current code are loaded from the results store.
+    store = ResultStore(results_path) if results_path is not None else None
+    started_calc = time.time()
+    try:
+        results = run_sweep(points, layout, seeds, workers, store)
+    finally:
+        if store is not None:
+            store.close()
+    ended_calc = time.time()
+    print(f"Calculation time {format(ended_calc - started_calc, '.4f')}")
 
+    failed_percentage = [summarize_replicas(point_stats)['mean']['failed_percentage'] for point_stats in results]
 
     plt.figure()
     plt.plot(plot_range, failed_percentage)
@@ -89,22 +90,10 @@ def plot_data_rate():
 
 def configure_nodes(number_of_nodes: int, ranges: [int, int], radius_node: [int, int],
                     message_length: int, send_freq_interval: [int, int]):
-    nodes = []
-    random.seed(2)
-
-    for id in range(number_of_nodes):
-        x = random.randint(0, ranges[0])
-        y = random.randint(0, ranges[1])
-
-        minRadius: int = radius_node[0]
-        maxRadius: int = radius_node[1]
-
-        radius = random.randint(minRadius, maxRadius)
-
-        #nodes.append(Host(id, x, y, radius, Aloha(message_length, send_freq_interval)))
-        nodes.append(Host(id, x, y, radius, SMAC(send_freq_interval=send_freq_interval)))
+    layout = generate_layout(number_of_nodes, ranges, radius_node)
 
-    return nodes
+    #return build_nodes(layout, 'aloha', message_length, send_freq_interval)
+    return build_nodes(layout, 'smac', message_length, send_freq_interval)
 
 
 def plot_points(nodes):
@@ -140,7 +129,7 @@ def plot_points(nodes):
     plt.grid(True)
     plt.show()
 
-def plot_schedule(nodes):
+def plot_schedule(nodes, start=0, end=10000):
     label_mapping = {
         0: 'INIT',
         1: 'SYNC_INIT',
@@ -151,7 +140,7 @@ def plot_schedule(nodes):
 
     plt.figure()
     for node in nodes:
-        plt.plot(node.plot_schedule)
+        plt.plot(range(start, end), node.plot_schedule.expand(start, end))
         plt.xlabel('Round')
         plt.ylabel('State')
         plt.title(f"Schedule of node {node.mac}")
@@ -0,0 +1,84 @@
+import heapq
+from typing import Dict, List
+
+from network.message import Message
+
+
+class Channel:
+    """The messages a node can hear, indexed by the round in which they end.
+
+    The simulator asks two things of a channel: which messages end in a given round, and which messages overlap the
+    transmission window of a message. Both are answered from a calendar of end time -> messages. Ending messages are a
+    single lookup. For overlaps we use that a message can't be longer than the longest message seen on this channel,
+    so everything overlapping [start, end] ends somewhere in [start, end + longest duration] and only those buckets
+    have to be looked at, regardless of how many messages the channel holds.
+
+    Old messages are evicted a whole bucket at a time, in order of their end time.
+    """
+
+    def __init__(self):
+        self.by_end: Dict[int, List[Message]] = {}
+        # Heap of the keys of by_end, so we always know which bucket ends first.
+        self.end_times: List[int] = []
+        self.longest_duration = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, message: Message):
+        bucket = self.by_end.get(message.end_time)
+        if bucket is None:
+            bucket = self.by_end[message.end_time] = []
+            heapq.heappush(self.end_times, message.end_time)
+        bucket.append(message)
+
+        duration = message.end_time - message.start_time
+        if duration > self.longest_duration:
+            self.longest_duration = duration
+        self.count += 1
+
+    def ending_at(self, end_time: int) -> List[Message]:
+        return self.by_end.get(end_time, [])
+
+    def find_conflicting(self, message: Message) -> List[Message]:
+        """Find all messages on this channel that overlap with this message, touching counts as overlapping."""
+        conflicting = []
+        # With fewer messages than buckets to look at, going over all of them is cheaper.
+        if self.count < message.end_time + self.longest_duration + 1 - message.start_time:
+            for bucket in self.by_end.values():
+                for other in bucket:
+                    if other.start_time <= message.end_time and other.end_time >= message.start_time \
+                            and other is not message:
+                        conflicting.append(other)
+            return conflicting
+
+        for end_time in range(message.start_time, message.end_time + self.longest_duration + 1):
+            bucket = self.by_end.get(end_time)
+            if bucket is None:
+                continue
+
+            for other in bucket:
+                if other.start_time <= message.end_time and other is not message:
+                    conflicting.append(other)
+
+        return conflicting
+
+    def evict(self, round_counter: int) -> List[Message]:
+        """Removes and returns the messages that can no longer conflict with a message that still has to be delivered.
+
+        Messages that still have to be delivered end after this round, so they start at round_counter + 1 -
+        longest_duration at the earliest. Everything that ended before that can't overlap with them anymore.
+        """
+        return self.evict_before(round_counter + 1 - self.longest_duration)
+
+    def evict_before(self, horizon: int) -> List[Message]:
+        """Removes and returns the messages that ended before horizon."""
+        evicted = []
+
+        while len(self.end_times) > 0 and self.end_times[0] < horizon:
+            bucket = self.by_end.pop(heapq.heappop(self.end_times))
+            self.count -= len(bucket)
+            evicted.extend(bucket)
+
+        return evicted
@@ -1,28 +1,34 @@
 from collections.abc import Sequence
-import weakref
 import math
 import logging
 from typing import Any, Callable, Dict, List
 
 from network.message import Message
+from network.metrics import MESSAGES_SENT, MetricsRegistry
+from network.timeline import StateTimeline
 
 
 class Host:
-    _instances = set()  # atribute protect to save all instances of host
-
     # message queue that the simulator can use to deposit messages into.
     message_queue: List[Message] 
 
-    # Channel placeholder, will get registered by the simulator.
-    channels = None
+    # World of the simulation this host is part of, will get registered by the simulator.
+    world = None
+
+    # Medium placeholder, will get registered by the simulator.
+    medium = None
+
+    # Precomputed adjacency, will get registered by the simulator. Without it neighbors are searched every time.
+    topology = None
 
     # Algorithm used by to determine what to do with incoming messages and what to send.
     # Takes an incoming message if available, a list of neighbors that can be contacted. 
     # algorithm: Callable[[Message, List[Any], int], Message]
     algorithm = None
 
-    # Metrics kept per host, can be customized if need be.
-    metrics: Dict
+    # Counters of this host live in a registry shared by all nodes of a simulation, at metrics_index.
+    metrics_registry: MetricsRegistry = None
+    metrics_index: int = 0
 
     # def __init__(self, mac: int, x: float, y: float, reach: float, algorithm: Callable[[Message, List[Any], int], Message]):	#default constructor
     def __init__(self, mac: int, x: float, y: float, reach: float, algorithm):  # default constructor
@@ -30,24 +36,14 @@ class Host:
         self.mac = mac
         self.positionx = x
         self.positiony = y
-        self._instances.add(weakref.ref(self))
 
         self.algorithm = algorithm
-        self.metrics = {"failed to deliver": 0, "successfully delivered": 0, "messages sent": 0}
-        self.channels = {}
+        # Own registry until the simulator registers its shared one
+        self.metrics_registry = MetricsRegistry(1)
+        self.metrics_index = 0
         self.message_queue = []
-        self.plot_schedule = list()
-
-    @classmethod  # to list all instances of host class
-    def get_instances(cls):
-        dead = set()
-        for ref in cls._instances:
-            obj = ref()
-            if obj is not None:
-                yield obj
-            else:
-                dead.add(ref)
-        cls._instances -= dead
+        # States of the algorithm over time, only the changes are stored.
+        self.plot_schedule = StateTimeline()
 
     # Evaluates a single round, checks if there is a message to handle else just go to the algorithm.
     # Maybe it might be nice to give the algorithm a sense of the counter but that can be added later.
@@ -61,19 +57,25 @@ class Host:
 
         # If we have a message to send lets do that now.
         if return_message is not None:
-            self.metrics["messages sent"] = self.metrics["messages sent"] + 1
+            self.metrics_registry.add(MESSAGES_SENT, self.metrics_index, round_counter)
             self.send_message(return_message)
 
-        # Done with our round
-        return
+        # Done with our round, let the simulator know what we sent so it can schedule the delivery.
+        return return_message
 
-    def send_message(self, message: Message):
-        neighbors = self.get_neighbors()
+    def next_wakeup(self, round_counter):
+        """Returns the next round in which this host has to be evaluated, used by the event driven simulator.
+
+        Queued messages are handled one per round so those need the next round, otherwise it is up to the algorithm.
+        """
+        if len(self.message_queue) > 0:
+            return round_counter + 1
+
+        return max(round_counter + 1, self.algorithm.next_wakeup(self, round_counter))
 
-        self.channels[self].append(message)
-        # Dumps the messages in the channel of the neighbors.
-        for each in neighbors:
-            self.channels[each].append(message)
+    def send_message(self, message: Message):
+        # Puts the message on the medium once, ourself and our neighbors hear it from there.
+        self.medium.transmit(self, message)
 
     def is_reacheable(self, neighbor):  # check if neighbor host is reacheable
         first_part = ((self.positionx - neighbor.positionx) ** 2)
@@ -86,10 +88,19 @@ class Host:
             return distance <= self.reach  # returns true if is reacheable
 
     def get_neighbors(self):  # get all neighbors of a host
+        if self.topology is not None:
+            return self.topology.get_neighbors(self)
+
+        if self.world is None:
+            return []
+
         neighbors = []
-        for obj in Host.get_instances():
+        # Only the hosts in the grid cells around us can be in reach
+        for obj in self.world.grid.query(self.positionx, self.positiony, self.reach):
             if (self.is_reacheable(obj)):  # check if a node is reacheable
                 neighbors.append(obj)  # add to the list of neighbors
+        # In the order of the world, the order of the grid cells depends on their size
+        neighbors.sort(key=self.world.index_of.get)
         return neighbors  # returns the list
 
     def get_mac(self):  # returns the mac address
@@ -104,8 +115,36 @@ class Host:
     def get_reach(self):  # returns the reach
         return self.reach
 
-    def set_channels(self, channels):
-        self.channels = channels
+    def set_position(self, x: float, y: float):  # moves the host, keeping the spatial index up to date
+        self.positionx = x
+        self.positiony = y
+        if self.world is not None:
+            self.world.grid.move(self, x, y)
+        if self.topology is not None:
+            self.topology.invalidate(self)
+
+    def set_reach(self, reach: float):  # changes the reach, the neighbors of this host change with it
+        self.reach = reach
+        if self.topology is not None:
+            self.topology.invalidate(self)
+
+    def set_world(self, world):
+        self.world = world
+
+    def set_medium(self, medium):
+        self.medium = medium
+
+    def set_topology(self, topology):
+        self.topology = topology
+
+    def set_metrics(self, registry: MetricsRegistry, index: int):
+        self.metrics_registry = registry
+        self.metrics_index = index
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        """Metrics of this host by name, a copy of its counters in the registry."""
+        return self.metrics_registry.node_metrics(self.metrics_index)
 
     def add_message_to_queue(self, message):
         self.message_queue.append(message)
@@ -0,0 +1,105 @@
+from typing import Dict, List, Set
+
+from network.channel import Channel
+from network.message import Message
+from network.topology import Topology
+
+
+class Transmission:
+    """A message on the medium, stored once no matter how many nodes can hear it."""
+    __slots__ = ('id', 'sender', 'start_time', 'end_time', 'message')
+
+    def __init__(self, transmission_id: int, sender: int, message: Message):
+        self.id = transmission_id
+        # Index of the sending node in the topology
+        self.sender = sender
+        self.start_time = message.start_time
+        self.end_time = message.end_time
+        self.message = message
+
+
+class Medium:
+    """Shared wireless medium, every transmission is stored once instead of once per node that can hear it.
+
+    What a node can hear follows from the topology: its own transmissions and those of every node that has it as a
+    neighbor. So instead of copying a transmission into the channel of every listener, every transmission is put in
+    the calendar of all transmissions, which answers what ends in a round, and in the calendar of its sender. The view
+    of a node on the medium is the calendars of the senders it can hear, so finding conflicts only looks at those.
+    Sending is two inserts no matter the degree of the sender, and only the transmissions that actually end get
+    expanded to their listeners.
+    """
+
+    def __init__(self, topology: Topology):
+        self.topology = topology
+        self.channel = Channel()
+        # Calendar per sender index, with the same transmissions as channel
+        self.sent: List[Channel] = [Channel() for _ in topology.nodes]
+        self.transmission_counter = 0
+
+        # Per node the indexes of the nodes it can hear, including itself.
+        self.hearing: List[Set[int]] = []
+        self.index_of_mac: Dict[int, int] = {}
+        self.topology_version = -1
+
+    def update_hearing(self):
+        # The topology gets rebuilt when it is invalidated, so follow along when that happened.
+        if not self.topology.valid:
+            self.topology.build()
+        if self.topology_version == self.topology.version:
+            return
+
+        nodes = self.topology.nodes
+        self.hearing = [{index} for index in range(len(nodes))]
+        for sender in range(len(nodes)):
+            for listener in self.topology.neighbor_indices(sender):
+                self.hearing[listener].add(sender)
+
+        self.index_of_mac = {node.mac: index for index, node in enumerate(nodes)}
+        self.topology_version = self.topology.version
+
+    def transmit(self, node, message: Message) -> Transmission:
+        transmission = Transmission(self.transmission_counter, self.topology.index_of[node], message)
+        self.transmission_counter += 1
+        self.channel.append(transmission)
+        self.sent[transmission.sender].append(transmission)
+        return transmission
+
+    def ending_at(self, end_time: int) -> List[Transmission]:
+        return self.channel.ending_at(end_time)
+
+    def receivers(self, transmission: Transmission) -> List[int]:
+        """Indexes of the nodes that hear this transmission and are addressed by it."""
+        self.update_hearing()
+        source = transmission.message.source
+        destination = transmission.message.destination
+
+        # Broadcast, everyone that can hear it except the sender itself.
+        if destination == -1:
+            nodes = self.topology.nodes
+            return [listener for listener in self.topology.neighbor_indices(transmission.sender)
+                    if nodes[listener].mac != source]
+
+        listener = self.index_of_mac.get(destination)
+        if listener is not None and transmission.sender in self.hearing[listener]:
+            return [listener]
+        return []
+
+    def listeners(self, transmission: Transmission) -> List[int]:
+        """Indexes of all nodes that hear this transmission, the sender first."""
+        return [transmission.sender, *self.topology.neighbor_indices(transmission.sender)]
+
+    def find_conflicting(self, transmission: Transmission, listener: int) -> List[Transmission]:
+        """Find all transmissions the listener hears that overlap with this transmission."""
+        self.update_hearing()
+        conflicting = []
+        for sender in self.hearing[listener]:
+            conflicting.extend(self.sent[sender].find_conflicting(transmission))
+        return conflicting
+
+    def evict(self, round_counter: int) -> List[Transmission]:
+        # Senders keep their transmissions as long as the medium does, their own longest message can be shorter.
+        horizon = round_counter + 1 - self.channel.longest_duration
+        evicted = self.channel.evict(round_counter)
+        for sender in {transmission.sender for transmission in evicted}:
+            self.sent[sender].evict_before(horizon)
+        return evicted
@@ -1,3 +1,5 @@
+from enum import Enum
+
 
 class Message:
 
@@ -6,19 +8,36 @@ class Message:
     start_time : int = 0
     end_time : int = 0
     message : str = ""
+    # Type of the message and its structured fields, so protocols don't have to parse the payload.
+    message_type : Enum = None
+    header = None
 
-    def __init__(self, source, destination, start_time, end_time, message):
+    def __init__(self, source, destination, start_time, end_time, message, message_type: Enum = None, header=None):
         self.source = source
         self.destination = destination
         self.start_time = start_time
         self.end_time = end_time
         self.message = message
+        self.message_type = message_type
+        self.header = header
 
     def before_message(self, message):
         if (self.start_time < message.start_time):
             return True
         return False
 
+    def get_type_name(self) -> str:
+        if self.message_type is not None:
+            return self.message_type.name
+        return self.message.split(' ', 1)[0]
+
+    def get_text(self) -> str:
+        """The message as it used to be written in full in the payload, with its type and fields."""
+        if self.message_type is not None:
+            fields = self.header if self.header is not None else self.message
+            return f"{self.message_type.name} {fields}"
+        return self.message
+
     def __str__(self):
-        return f"start: {self.start_time}, end: {self.end_time}, source: {self.source}, dest: {self.destination}, message: {self.message}"
+        return f"start: {self.start_time}, end: {self.end_time}, source: {self.source}, dest: {self.destination}, message: {self.get_text()}"
 
@@ -0,0 +1,52 @@
+from array import array
+from typing import Dict, List
+
+# Indexes of the counters kept for every node.
+FAILED_TO_DELIVER = 0
+SUCCESSFULLY_DELIVERED = 1
+MESSAGES_SENT = 2
+
+METRIC_NAMES = ("failed to deliver", "successfully delivered", "messages sent")
+
+
+class MetricsRegistry:
+    """Integer counters per metric per node, optionally also summed per window of rounds.
+
+    Every metric is a preallocated array with a counter per node index, so counting is an array update instead of a
+    read-modify-write on a dictionary with string keys. When a window is given the registry also keeps, per metric,
+    the total of all nodes for every window of that many rounds, which shows how for example collisions evolve over
+    the run instead of only their final total.
+    """
+
+    def __init__(self, number_of_nodes: int, window: int = None, rounds: int = 0):
+        self.number_of_nodes = number_of_nodes
+        self.counters = [array('q', [0]) * number_of_nodes for _ in METRIC_NAMES]
+
+        self.window = window
+        number_of_windows = -(-rounds // window) if window is not None else 0
+        self.series = [array('q', [0]) * number_of_windows for _ in METRIC_NAMES]
+
+    def add(self, metric: int, node_index: int, round_counter: int, amount: int = 1):
+        self.counters[metric][node_index] += amount
+
+        if self.window is not None:
+            series = self.series[metric]
+            window_index = round_counter // self.window
+            if window_index >= len(series):
+                series.extend(array('q', [0]) * (window_index + 1 - len(series)))
+            series[window_index] += amount
+
+    def get(self, metric: int, node_index: int) -> int:
+        return self.counters[metric][node_index]
+
+    def total(self, metric: int) -> int:
+        return sum(self.counters[metric])
+
+    def node_metrics(self, node_index: int) -> Dict[str, int]:
+        """All metrics of a single node by name."""
+        return {name: counters[node_index] for name, counters in zip(METRIC_NAMES, self.counters)}
+
+    def get_series(self) -> Dict[str, List[int]]:
+        """Total of every metric per window by name, empty lists when no window was given."""
+        length = max(len(series) for series in self.series)
+        return {name: list(series) + [0] * (length - len(series)) for name, series in zip(METRIC_NAMES, self.series)}
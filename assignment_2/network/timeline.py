@@ -0,0 +1,60 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterator, List, Tuple
+
+
+class StateTimeline:
+    """States of a node over time, stored as the rounds in which they changed.
+
+    A node is in the same state for hundreds of rounds at a time, so instead of one entry per round only the
+    transitions are kept: parallel arrays with the round a state started in and the state code. Memory grows with the
+    number of state changes, not with the length of the simulation. Use state_at or expand to get the states per round
+    back.
+    """
+
+    def __init__(self):
+        self.rounds = array('q')
+        self.states = array('b')
+
+    def record(self, round_counter: int, state: int):
+        """The node is in state from round_counter on. Rounds have to be recorded in increasing order."""
+        if len(self.rounds) > 0:
+            if self.states[-1] == state:
+                return
+            # Changed again within the same round, only the last state counts.
+            if self.rounds[-1] == round_counter:
+                self.rounds.pop()
+                self.states.pop()
+                if len(self.states) > 0 and self.states[-1] == state:
+                    return
+
+        self.rounds.append(round_counter)
+        self.states.append(state)
+
+    def state_at(self, round_counter: int) -> int:
+        """State in the given round, None before the first recorded state."""
+        position = bisect_right(self.rounds, round_counter) - 1
+        if position < 0:
+            return None
+        return self.states[position]
+
+    def expand(self, start: int, end: int) -> List[int]:
+        """State for every round in [start, end), None for rounds before the first recorded state."""
+        expanded = []
+        position = bisect_right(self.rounds, start) - 1
+        round_counter = start
+        while round_counter < end:
+            state = self.states[position] if position >= 0 else None
+            next_change = self.rounds[position + 1] if position + 1 < len(self.rounds) else end
+            next_change = min(next_change, end)
+            expanded.extend([state] * (next_change - round_counter))
+            round_counter = next_change
+            position += 1
+        return expanded
+
+    def transitions(self) -> Iterator[Tuple[int, int]]:
+        """Yields (round, state) for every state change."""
+        return zip(self.rounds, self.states)
+
+    def __len__(self):
+        return len(self.rounds)
@@ -0,0 +1,75 @@
+from array import array
+from typing import Dict, List, Tuple
+
+from network.spatial_index import SpatialGrid
+
+
+class Topology:
+    """Precomputed directed adjacency of a fixed set of hosts.
+
+    In assignment 2 nodes never move, so instead of searching for neighbors on every send the simulator builds the
+    adjacency once and hands it to the hosts. It is stored in CSR form: the neighbors of the node at index i are
+    indices[offsets[i]:offsets[i + 1]], next to that every node gets a tuple of its neighbor hosts which is what
+    Host.get_neighbors returns. The adjacency is directed because reach is per node, a node can hear another node
+    without being heard back.
+
+    Whenever the position or reach of a node changes the topology has to be invalidated, it is then rebuilt the next
+    time it gets used.
+    """
+
+    def __init__(self, nodes: List):
+        self.nodes = nodes
+        self.index_of: Dict = {node: index for index, node in enumerate(nodes)}
+
+        self.offsets = array('l')
+        self.indices = array('l')
+        self.neighbors: List[Tuple] = []
+        self.valid = False
+        # Counts the builds, so users of the adjacency can tell when it changed.
+        self.version = 0
+
+        self.build()
+
+    def build(self):
+        # Local grid so only the nodes of this topology can become neighbors.
+        grid = SpatialGrid()
+        for node in self.nodes:
+            grid.insert(node, node.positionx, node.positiony, node.reach)
+
+        self.offsets = array('l', [0])
+        self.indices = array('l')
+        self.neighbors = []
+
+        for node in self.nodes:
+            # In the order of the nodes, the order of the grid cells depends on their size
+            neighbors = tuple(sorted((obj for obj in grid.query(node.positionx, node.positiony, node.reach)
+                                      if node.is_reacheable(obj)), key=self.index_of.get))
+
+            self.neighbors.append(neighbors)
+            self.indices.extend(self.index_of[neighbor] for neighbor in neighbors)
+            self.offsets.append(len(self.indices))
+
+        self.valid = True
+        self.version += 1
+
+    def invalidate(self, node=None):
+        """Marks the adjacency as outdated, to be called when the position or reach of a node changes.
+
+        A change to one node can change the neighbors of any node around it, so the whole adjacency is rebuilt.
+        """
+        self.valid = False
+
+    def get_neighbors(self, node) -> Tuple:
+        if not self.valid:
+            self.build()
+        return self.neighbors[self.index_of[node]]
+
+    def neighbor_indices(self, index: int) -> array:
+        if not self.valid:
+            self.build()
+        return self.indices[self.offsets[index]:self.offsets[index + 1]]
+
+    def average_degree(self) -> float:
+        if not self.valid:
+            self.build()
+        return len(self.indices) / len(self.nodes)
@@ -0,0 +1,134 @@
+import os
+import struct
+import sys
+from typing import Dict, Iterator, Sequence, Tuple
+
+from network.message import Message
+
+# Every record starts with a tag byte saying what follows.
+TAG_KIND = 0
+TAG_MESSAGE = 1
+
+# Defines a message kind: tag, kind id, length of the name, followed by the utf-8 name.
+KIND_HEADER = struct.Struct('<BHH')
+# A message: tag, source, destination, start, end, deleted at, kind id, number of listeners, length of the text,
+# followed by the macs of the listeners and the utf-8 text of the message.
+MESSAGE_RECORD = struct.Struct('<BiiqqqHII')
+
+
+class TraceWriter:
+    """Writes the messages evicted from the medium to one buffered binary file.
+
+    Every message is written once, with the macs of all nodes that heard it (the sender and its neighbors) and its
+    text, so the view of every node on the medium can be rebuilt. The type of a message (its message_type, or else
+    the first word of its payload) is stored as a small id. The first time a type shows up a kind record mapping the
+    id to the name is written, so the file describes itself. Use read_trace or write_text_trace to get the messages
+    back.
+
+    A writer can be pickled with a simulator snapshot, it then remembers how far the file got. The restored writer has
+    no open file until reopen is called.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1 << 20):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.file = open(path, 'wb', buffering=buffer_size)
+        self.kinds: Dict[str, int] = {}
+        # Length of the file once closed
+        self.position = 0
+
+    def get_kind(self, message: Message) -> int:
+        name = message.get_type_name()
+        kind = self.kinds.get(name)
+        if kind is None:
+            kind = len(self.kinds)
+            self.kinds[name] = kind
+            encoded = name.encode()
+            self.file.write(KIND_HEADER.pack(TAG_KIND, kind, len(encoded)) + encoded)
+        return kind
+
+    def write(self, listeners: Sequence[int], message: Message, deleted_at: int):
+        kind = self.get_kind(message)
+        text = message.get_text().encode()
+        self.file.write(MESSAGE_RECORD.pack(TAG_MESSAGE, message.source, message.destination, message.start_time,
+                                            message.end_time, deleted_at, kind, len(listeners), len(text)))
+        self.file.write(struct.pack(f'<{len(listeners)}i', *listeners) + text)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.position = self.file.tell()
+        self.file.close()
+
+    def reopen(self, path: str):
+        """Continues the trace of a restored writer.
+
+        On the same path the file is cut back to where it was at the snapshot, anything a later run wrote is dropped.
+        Any other path starts a new file with just the rest of the trace.
+        """
+        if path == self.path and os.path.exists(path) and os.path.getsize(path) >= self.position:
+            self.file = open(path, 'r+b', buffering=self.buffer_size)
+            self.file.truncate(self.position)
+            self.file.seek(self.position)
+            return
+
+        output_path = os.path.dirname(path)
+        if output_path != "":
+            os.makedirs(output_path, exist_ok=True)
+        self.path = path
+        self.file = open(path, 'wb', buffering=self.buffer_size)
+        # Kind records have to be written again in the new file
+        self.kinds = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.file is not None and not self.file.closed:
+            state['position'] = self.file.tell()
+        state['file'] = None
+        return state
+
+
+def read_trace(path: str) -> Iterator[Tuple[Tuple[int, ...], int, int, int, int, int, str, str]]:
+    """Yields (listeners, source, destination, start, end, deleted at, type, text) for every message in a trace file."""
+    kinds: Dict[int, str] = {}
+    with open(path, 'rb') as file:
+        while True:
+            tag = file.read(1)
+            if len(tag) == 0:
+                return
+
+            if tag[0] == TAG_KIND:
+                _, kind, length = KIND_HEADER.unpack(tag + file.read(KIND_HEADER.size - 1))
+                kinds[kind] = file.read(length).decode()
+            else:
+                record = MESSAGE_RECORD.unpack(tag + file.read(MESSAGE_RECORD.size - 1))
+                _, source, destination, start, end, deleted_at, kind, count, length = record
+                listeners = struct.unpack(f'<{count}i', file.read(4 * count))
+                text = file.read(length).decode()
+                yield listeners, source, destination, start, end, deleted_at, kinds[kind], text
+
+
+def write_text_trace(path: str, output_path: str):
+    """Converts a trace file to the text form, one file per node named node_<mac> in output_path.
+
+    The file of a node has every message it heard, its own and those of its neighbors, like its channel file used to.
+    """
+    files = {}
+    try:
+        for listeners, source, destination, start, end, deleted_at, kind, text in read_trace(path):
+            line = f"start: {start}, end: {end}, source: {source}, dest: {destination}, message: {text}" \
+                   f" deleted at: {deleted_at} \n"
+            for node in listeners:
+                if node not in files:
+                    files[node] = open(os.path.join(output_path, f"node_{node}"), 'w')
+                files[node].write(line)
+    finally:
+        for file in files.values():
+            file.close()
+
+
+if __name__ == '__main__':
+    # python -m network.trace output/trace.bin converts the trace to text files next to it.
+    trace_path = sys.argv[1]
+    write_text_trace(trace_path, os.path.dirname(trace_path))
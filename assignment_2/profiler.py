@@ -0,0 +1,56 @@
+import json
+from time import perf_counter
+from typing import Dict
+
+
+class PhaseProfiler:
+    """Cumulative wall time and number of calls per phase of the simulation loop.
+
+    The simulator only measures when it was given a profiler, without one every hook is a single check against None.
+    Phases can contain other phases, the loop contains all of them, so the times don't add up to the total. Node
+    evaluations are split up per state of the protocol when it has one.
+    """
+
+    def __init__(self):
+        self.times: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    @staticmethod
+    def start() -> float:
+        return perf_counter()
+
+    def stop(self, phase: str, started: float):
+        """Adds the time since started, as returned by start, to the phase."""
+        self.times[phase] = self.times.get(phase, 0.0) + perf_counter() - started
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    @staticmethod
+    def evaluate_phase(algorithm) -> str:
+        state = getattr(algorithm, 'state', None)
+        if state is None:
+            return "evaluate"
+        return f"evaluate {state.name}"
+
+    def get_breakdown(self) -> Dict[str, Dict]:
+        """Per phase its total time in seconds, number of calls, time per call and share of the total time.
+
+        The total time is that of the longest phase, the loop around all others.
+        """
+        total = max(self.times.values(), default=0.0)
+        breakdown = {}
+        for phase in sorted(self.times, key=self.times.get, reverse=True):
+            breakdown[phase] = {'time': self.times[phase],
+                                'calls': self.calls[phase],
+                                'time_per_call': self.times[phase] / self.calls[phase],
+                                'share': self.times[phase] / total if total > 0 else 0}
+        return breakdown
+
+    def print_report(self):
+        print(f"{'phase':<24}{'time (s)':>12}{'calls':>12}{'per call (us)':>16}{'share':>10}")
+        for phase, row in self.get_breakdown().items():
+            print(f"{phase:<24}{row['time']:>12.4f}{row['calls']:>12d}{row['time_per_call'] * 1e6:>16.2f}"
+                  f"{row['share'] * 100:>9.1f}%")
+
+    def write_json(self, path: str):
+        with open(path, 'w') as file:
+            json.dump(self.get_breakdown(), file, indent=2)
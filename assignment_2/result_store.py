@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Sequence, Tuple
+
+# Source the simulation results depend on, relative to this directory.
+# sweep.py decides how a point is simulated: its algorithm, seeding and loop.
+CODE_PATHS = ['simulator.py', 'sweep.py', 'network', 'mac_protocol']
+
+
+def code_version() -> str:
+    """Hash of the simulator source code, so results of other versions of the code are never reused."""
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    files = []
+    for code_path in CODE_PATHS:
+        full_path = os.path.join(base_path, code_path)
+        if os.path.isdir(full_path):
+            files.extend(os.path.join(full_path, name) for name in os.listdir(full_path) if name.endswith('.py'))
+        else:
+            files.append(full_path)
+
+    sha = hashlib.sha256()
+    for file_path in sorted(files):
+        sha.update(os.path.relpath(file_path, base_path).encode())
+        with open(file_path, 'rb') as file:
+            sha.update(file.read())
+    return sha.hexdigest()[:16]
+
+
+def config_hash(layout: Sequence[Tuple[int, int, int]], point: Dict, seed: int, version: str) -> str:
+    """Key of a single run: the nodes it ran on, its protocol parameters and timeout, the seed and the code version."""
+    config = {'layout': [list(node) for node in layout], 'point': point, 'seed': seed, 'code_version': version}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+class ResultStore:
+    """SQLite database with the get_stats results of earlier runs, keyed by config_hash.
+
+    Every run is a row in runs with its point and seed, every number from its get_stats a row in metrics. Runs are
+    only ever added, so the database keeps the results of every version of the code that was run.
+    """
+
+    def __init__(self, path: str = "results.sqlite"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS runs (
+                                       config_hash TEXT PRIMARY KEY,
+                                       code_version TEXT NOT NULL,
+                                       point TEXT NOT NULL,
+                                       seed INTEGER NOT NULL,
+                                       created REAL NOT NULL)""")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS metrics (
+                                       config_hash TEXT NOT NULL REFERENCES runs (config_hash),
+                                       name TEXT NOT NULL,
+                                       value NUMERIC NOT NULL,
+                                       PRIMARY KEY (config_hash, name))""")
+        self.connection.commit()
+
+    def get(self, key: str) -> Dict:
+        """Returns the stored get_stats result for this key, or None if it was never run."""
+        rows = self.connection.execute("SELECT name, value FROM metrics WHERE config_hash = ?", (key,)).fetchall()
+        if len(rows) == 0:
+            return None
+        return {name: value for name, value in rows}
+
+    def put(self, key: str, point: Dict, seed: int, version: str, stats: Dict):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)",
+                                    (key, version, json.dumps(point, sort_keys=True), seed, time.time()))
+            self.connection.executemany("INSERT OR REPLACE INTO metrics VALUES (?, ?, ?)",
+                                        [(key, name, value) for name, value in stats.items()])
+
+    def query(self, metric: str, version: str = None, **point_filters) -> List[Tuple[Dict, int, float]]:
+        """Returns (point, seed, value) of a metric for every stored run matching the filters.
+
+        Filters are compared against the values in the point, for example query('failed_percentage',
+        protocol='smac', number_of_nodes=10). Without a version, runs of all code versions are returned.
+        """
+        sql = "SELECT runs.point, runs.seed, metrics.value FROM runs JOIN metrics USING (config_hash) WHERE name = ?"
+        parameters = [metric]
+        if version is not None:
+            sql += " AND code_version = ?"
+            parameters.append(version)
+
+        results = []
+        for point_json, seed, value in self.connection.execute(sql + " ORDER BY runs.created", parameters):
+            point = json.loads(point_json)
+            if all(point.get(name) == filter_value for name, filter_value in point_filters.items()):
+                results.append((point, seed, value))
+        return results
+
+    def close(self):
+        self.connection.close()
@@ -1,12 +1,21 @@
+import heapq
 import math
+import random
 import sys
 import os
 import shutil
 from fileinput import close
-from typing import Dict, List, TextIO
+from typing import Dict, List
 
+import checkpoint
 from network.host import Host
+from network.medium import Medium, Transmission
 from network.message import Message
+from network.metrics import FAILED_TO_DELIVER, MESSAGES_SENT, SUCCESSFULLY_DELIVERED, MetricsRegistry
+from network.topology import Topology
+from network.trace import TraceWriter
+from network.world import World
+from profiler import PhaseProfiler
 
 
 class simulator:
@@ -14,105 +23,298 @@ class simulator:
     # nodes: List[Host] = []
     # timeout: int = sys.maxsize
 
-    # This is an interesting one, this dictionary keeps track for all nodes if their sending channel is clear.
-    # How it does this is done because every node that decides to transmit will add their transmission time window
-    # to the dictionary of themselves and their neighbours. This way the nodes can check channel availability.
-    channels: Dict[Host, List[Message]] = {}
-    channel_files: Dict[Host, TextIO] = {}
-    channel_cleaning_evaluation: Dict[Host, int] = {}
-
     # node_channel_counter: Dict[Host, int] = {}
     # node_info_dict: Dict[Host, Dict] = {}
 
-    def __init__(self, nodes, timeout):
+    # Kinds of entries in the event queue of the event driven loop, evaluations sort before deliveries in a round.
+    EVENT_EVALUATE = 0
+    EVENT_DELIVER = 1
+
+    # Only this directory gets cleaned before a run, it holds nothing but the output of earlier runs.
+    DEFAULT_TRACE_PATH = "output/trace.bin"
+
+    def __init__(self, nodes, timeout, event_driven: bool = False, trace_path: str = DEFAULT_TRACE_PATH,
+                 metrics_window: int = None, profiler: PhaseProfiler = None):
         self.counter: int = 0
         self.nodes: List[Host] = nodes
         self.timeout = timeout
-
-        # self.channels: Dict[Host, List[Message]] = {}
-        # self.channel_files: Dict[Host, TextIO] = {}
-        # self.channel_cleaning_evaluation: Dict[Host, int] = {}
+        # Registry of the nodes of this simulation only, hosts search their neighbors in it.
+        self.world = World(nodes)
+        # When set the simulator jumps from event to event instead of evaluating every node every round.
+        self.event_driven = event_driven
+        # File the messages on the medium get written to, None disables tracing.
+        self.trace_path = trace_path
+
+        # Adjacency of the nodes, built at the start of the loop since nodes don't move.
+        self.topology: Topology = None
+
+        # This is an interesting one, the medium keeps track for all nodes if their sending channel is clear.
+        # Every node that decides to transmit puts their transmission time window on the medium, which all nodes in
+        # reach of the sender hear. This way the nodes can check channel availability.
+        self.medium: Medium = None
+        self.trace: TraceWriter = None
+
+        # Measures the time spent per phase of the loop when given, the breakdown gets printed at the end.
+        self.profiler = profiler
+
+        # Counters of all nodes, when metrics_window is given also summed per that many rounds (see get_series).
+        self.metrics = MetricsRegistry(len(nodes), metrics_window, timeout)
+        for index, node in enumerate(nodes):
+            node.set_metrics(self.metrics, index)
 
         self.node_channel_counter: Dict[Host, int] = {}
         self.node_info_dict: Dict[Host, Dict] = {}
 
-    def begin_loop(self):
+        # State of the loop, kept here so it can be paused and continued (see begin_loop and snapshot).
+        self.started = False
+        self.events: List = None
+        self.next_round: set = None
+        # Random state of a paused run or a restored snapshot, set at the start of the next begin_loop.
+        self.random_state = None
 
-        output_path = "output/"
-        print("Cleaning run environment...")
-        if os.path.exists(output_path) and os.path.isdir(output_path):
-            shutil.rmtree(output_path)
-        os.mkdir("output/")
+    def begin_loop(self, until: int = None):
+        """Runs the simulation up to the timeout, or when until is given only the rounds before that one.
 
-        print("Starting simulator... with {:d} nodes", str(len(self.nodes)))
-        if len(self.nodes) <= 0:
-            print('No nodes registered so simulating nothing')
+        Calling it again continues where it stopped, which also works on a simulator restored from a snapshot.
+        """
+        limit = self.timeout if until is None else min(until, self.timeout)
+        if self.random_state is not None:
+            random.setstate(self.random_state)
+            self.random_state = None
+
+        if not self.started:
+            if self.trace_path is not None:
+                output_path = os.path.dirname(self.trace_path)
+                # A directory given by the caller can hold anything, the trace file itself gets truncated on opening.
+                if self.trace_path == simulator.DEFAULT_TRACE_PATH and os.path.isdir(output_path):
+                    print("Cleaning run environment...")
+                    shutil.rmtree(output_path)
+                if output_path != "":
+                    os.makedirs(output_path, exist_ok=True)
+
+            print("Starting simulator... with {:d} nodes", str(len(self.nodes)))
+            if len(self.nodes) <= 0:
+                print('No nodes registered so simulating nothing')
+                return
+
+            self.topology = Topology(self.nodes)
+            self.medium = Medium(self.topology)
+
+            if self.trace_path is not None:
+                self.trace = TraceWriter(self.trace_path)
+
+            # Register the topology and the medium
+            for node in self.nodes:
+                node.set_topology(self.topology)
+                node.set_medium(self.medium)
+            self.started = True
+        elif self.trace is not None and self.trace.file is None:
+            # Restored from a snapshot, continue the trace
+            self.trace.reopen(self.trace_path)
+
+        started = PhaseProfiler.start() if self.profiler is not None else None
+        if self.event_driven:
+            self.run_events(limit)
+        else:
+            self.run_rounds(limit)
+        if self.profiler is not None:
+            self.profiler.stop("loop", started)
+
+        if self.counter < self.timeout:
+            # Whatever uses the random module until this one continues, a fork included, doesn't change its run.
+            self.random_state = random.getstate()
+            print('Paused simulating at round %d' % self.counter)
             return
 
-        # Register channel dictionaries and metric dictionaries
-        for node in self.nodes:
-            self.channels[node] = []
-            # Pass the channel dictionary to all nodes
-            node.set_channels(self.channels)
+        if self.trace is not None:
+            self.trace.close()
 
-            self.channel_files[node] = open(f"{output_path}node_{node.mac}", 'w')
-            self.channel_cleaning_evaluation[node] = 0
+        print('Done simulating, ran for %d iterations' % self.counter)
+        if self.profiler is not None:
+            self.profiler.print_report()
+        return
 
-        while self.counter < self.timeout:
+    def run_rounds(self, limit: int):
+        """Round based main loop, every node gets evaluated every round."""
+        while self.counter < limit:
             # Progress bar
             simulator.print_progress_bar(self.counter, self.timeout)
 
             # Main loop to let nodes do their thing
             node: Host
             for node in self.nodes:
-                node.evaluate_round(self.counter)
+                if self.profiler is None:
+                    node.evaluate_round(self.counter)
+                else:
+                    self.evaluate_profiled(node)
 
             # check if we can actually deliver messages
-            for node in self.nodes:
-                node_channel = self.channels[node]
-                # only deliver the message once self.counter + 1 = end_time of the message for the node.
-
-                message_to_deliver = [x for x in node_channel if
-                                      x.end_time == self.counter + 1 and (x.destination == node.mac or (x.destination == -1 and x.source != node.mac))]
-
-                # We have multiple messages delivered at the same time, will be a collision
-                if len(message_to_deliver) > 1:
-                    node.metrics["failed to deliver"] = node.metrics["failed to deliver"] + len(message_to_deliver)
-                    continue
-
-                # No need evaulating if there are no messages to deliver
-                if len(message_to_deliver) == 1:
-                    blocking_messages = simulator.find_conflicting_messages(message_to_deliver[0], node_channel)
-                    if len(blocking_messages) > 0:
-                        node.metrics["failed to deliver"] = node.metrics["failed to deliver"] + 1
-                        continue
-                    else:
-                        node.message_queue.append(message_to_deliver[0])
-                        node.metrics["successfully delivered"] = node.metrics["successfully delivered"] + 1
-
-                # We are done evaluating, time to look at cleaning the channel.
-                self.clean_channels(node)
+            self.deliver_messages()
 
             self.counter = self.counter + 1
 
-        for node in self.nodes:
-            self.channel_files[node].close()
-        # for channel_file in self.channel_files:
-        #     os.remove(channel_file)
+    def run_events(self, limit: int):
+        """Event driven main loop, gives the same results as run_rounds but skips idle rounds.
 
-        print('Done simulating, ran for %d iterations' % self.counter)
-        return
+        Nodes only act at a few moments, when their algorithm has something scheduled or when a message arrives. So
+        instead of evaluating every node every round we keep a priority queue of (round, kind, node index) events and
+        jump the clock straight to the next round that has one. After a node is evaluated it is asked when it wants to
+        be evaluated again (Host.next_wakeup), and every message that gets sent schedules a delivery check for the
+        round before it ends. Nodes are still evaluated in list order within a round, so the sequence of random
+        numbers drawn is the same as in the round based loop.
+
+        Stops before round limit, the queue is kept in the simulator so the loop can continue from there.
+        """
+        if self.events is None:
+            self.events = [(0, simulator.EVENT_EVALUATE, index) for index in range(len(self.nodes))]
+            heapq.heapify(self.events)
+            self.next_round = set()
+        events = self.events
+        # Nodes to evaluate in the next round. Most wake-ups are for the next round, those skip the priority queue.
+        next_round = self.next_round
+
+        while len(next_round) > 0 or len(events) > 0:
+            next_counter = self.counter + 1 if len(next_round) > 0 else events[0][0]
+            if next_counter >= limit:
+                break
+            self.counter = next_counter
+            simulator.print_progress_bar(self.counter, self.timeout)
+
+            to_evaluate = next_round
+            next_round = set()
+            while len(events) > 0 and events[0][0] == self.counter and events[0][1] == simulator.EVENT_EVALUATE:
+                to_evaluate.add(heapq.heappop(events)[2])
+
+            for index in sorted(to_evaluate):
+                node = self.nodes[index]
+                if self.profiler is None:
+                    sent_message = node.evaluate_round(self.counter)
+                else:
+                    sent_message = self.evaluate_profiled(node)
+
+                wakeup = node.next_wakeup(self.counter)
+                if wakeup == self.counter + 1:
+                    next_round.add(index)
+                else:
+                    heapq.heappush(events, (wakeup, simulator.EVENT_EVALUATE, index))
+
+                # The message gets delivered in the round before it ends. Events after the timeout are kept, the
+                # timeout of a restored simulator may be later.
+                if sent_message is not None:
+                    delivery_round = sent_message.end_time - 1
+                    if self.counter <= delivery_round:
+                        heapq.heappush(events, (delivery_round, simulator.EVENT_DELIVER, index))
+
+            # Deliveries can also have been scheduled by the evaluations of this round.
+            has_deliveries = False
+            while len(events) > 0 and events[0][0] == self.counter:
+                heapq.heappop(events)
+                has_deliveries = True
+
+            if has_deliveries:
+                next_round.update(self.deliver_messages())
+
+        # Whoever is up for the next round goes into the queue, so it can be continued from limit.
+        for index in next_round:
+            heapq.heappush(events, (self.counter + 1, simulator.EVENT_EVALUATE, index))
+        self.next_round = set()
+        self.counter = limit
+
+    def snapshot(self) -> bytes:
+        """The full state of the simulation: nodes, protocol state, medium, metrics and the random state.
+
+        Take it between calls of begin_loop, restore gives back a simulator that continues exactly where this one is.
+        """
+        if self.trace is not None and self.trace.file is not None and not self.trace.file.closed:
+            self.trace.flush()
+        # A paused or restored simulator continues from its own random state
+        random_state = self.random_state if self.random_state is not None else random.getstate()
+        return checkpoint.dumps({'simulator': self, 'random_state': random_state}, self.nodes)
+
+    @staticmethod
+    def restore(snapshot: bytes, trace_path: str = None) -> 'simulator':
+        """Simulator from a snapshot, its random state gets set when begin_loop continues it.
+
+        The simulator that took the snapshot may still be writing its trace, so the restored one writes the rest of
+        its trace to trace_path, or none at all.
+        """
+        state = checkpoint.loads(snapshot)
+        restored: simulator = state['simulator']
+        restored.random_state = state['random_state']
+        restored.trace_path = trace_path
+        if trace_path is None:
+            restored.trace = None
+        return restored
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            file.write(self.snapshot())
+
+    @staticmethod
+    def load(path: str, trace_path: str = None) -> 'simulator':
+        with open(path, 'rb') as file:
+            return simulator.restore(file.read(), trace_path)
+
+    def fork(self, trace_path: str = None) -> 'simulator':
+        """Independent copy of this simulator from its current round, for example to continue with other traffic.
+
+        Like restore, the fork writes the rest of its trace to trace_path, or none at all.
+        """
+        return simulator.restore(self.snapshot(), trace_path)
+
+    def evaluate_profiled(self, node: Host) -> Message:
+        phase = PhaseProfiler.evaluate_phase(node.algorithm)
+        started = PhaseProfiler.start()
+        sent_message = node.evaluate_round(self.counter)
+        self.profiler.stop(phase, started)
+        return sent_message
+
+    def deliver_messages(self) -> List[int]:
+        """Delivers the transmissions ending next round to the nodes they are addressed to, if they did not collide.
+
+        Returns the indexes of the nodes that got a message put in their message queue.
+        """
+        started = PhaseProfiler.start() if self.profiler is not None else None
+
+        # only deliver the message once self.counter + 1 = end_time of the message for the node.
+        deliveries: Dict[int, List[Transmission]] = {}
+        for transmission in self.medium.ending_at(self.counter + 1):
+            for receiver in self.medium.receivers(transmission):
+                deliveries.setdefault(receiver, []).append(transmission)
+
+        delivered = []
+        for receiver in sorted(deliveries):
+            node = self.nodes[receiver]
+            message_to_deliver = deliveries[receiver]
+
+            # We have multiple messages delivered at the same time, will be a collision
+            if len(message_to_deliver) > 1:
+                self.metrics.add(FAILED_TO_DELIVER, receiver, self.counter, len(message_to_deliver))
+                continue
+
+            conflicts_started = PhaseProfiler.start() if self.profiler is not None else None
+            blocking_messages = self.medium.find_conflicting(message_to_deliver[0], receiver)
+            if self.profiler is not None:
+                self.profiler.stop("conflicts", conflicts_started)
+
+            if len(blocking_messages) > 0:
+                self.metrics.add(FAILED_TO_DELIVER, receiver, self.counter)
+            else:
+                node.message_queue.append(message_to_deliver[0].message)
+                self.metrics.add(SUCCESSFULLY_DELIVERED, receiver, self.counter)
+                delivered.append(receiver)
+
+        # We are done evaluating, time to look at cleaning the medium.
+        self.clean_channels()
+        if self.profiler is not None:
+            self.profiler.stop("deliver", started)
+        return delivered
 
     def get_stats(self):
         average_neighbors = self.get_average_neighbours()
-        total_failed = 0
-        total_successful = 0
-        total_send = 0
-
-        for node in self.nodes:
-            total_failed += node.metrics['failed to deliver']
-            total_successful += node.metrics['successfully delivered']
-            total_send += node.metrics['messages sent']
+        total_failed = self.metrics.total(FAILED_TO_DELIVER)
+        total_successful = self.metrics.total(SUCCESSFULLY_DELIVERED)
+        total_send = self.metrics.total(MESSAGES_SENT)
 
         if total_send == 0:
             successful_percentage = 0
@@ -133,13 +335,23 @@ class simulator:
         return stats_sim
 
 
+    def get_series(self) -> Dict[str, List]:
+        """Totals of all nodes per window of metrics_window rounds, plus the collision rate of every window.
+
+        The collision rate is the part of the messages that reached their receiver's delivery check that failed, None
+        for windows without any.
+        """
+        series = self.metrics.get_series()
+        series['collision rate'] = [failed / (failed + successful) if failed + successful > 0 else None
+                                    for failed, successful in zip(series['failed to deliver'],
+                                                                  series['successfully delivered'])]
+        return series
+
     def get_average_neighbours(self):
-        total_nodes = len(self.nodes)
-        neighbours: int = 0
-        for node in self.nodes:
-            neighbours += len(node.get_neighbors())
+        if self.topology is None:
+            self.topology = Topology(self.nodes)
 
-        return neighbours / total_nodes
+        return self.topology.average_degree()
 
     def print_results(self):
         """Method that prints results of the simulator
@@ -151,59 +363,26 @@ class simulator:
             for node in self.nodes:
                 print(f"Node {node.mac} has the following metrics: {str(node.metrics)}")
 
-    @staticmethod
-    def find_conflicting_messages(message: Message, message_channel: List[Message]) -> List[Message]:
-        """Find all messages conflicting with this message
-        
-        Returns the list of messages that conflict with this message, as in the end time is later then the start time of this message
-        as well as the start time being before the end time of this message.
-        """
-        return [x for x in message_channel if
-                (x.end_time >= message.start_time and x.start_time <= message.end_time and x != message)]
-
     @staticmethod
     def print_progress_bar(counter: int, timeout: int):
         if ((counter / timeout) * 100 - math.ceil((counter / timeout)) * 100) < 0.0001:
             print(f"Progress: {format((counter / timeout) * 100, '.2f')}%\r", end="")
 
-    def clean_channels(self, node: Host):
-        """Intricate method for doing bookkeeping on the node channels, keeping calculation of conflicts relatively cheap.
-
-        This method works by evaluating the first message, which has the first start time, (getting the one with the earliest end time would be more
-        optimal but requires more computation) and an endtime. To determine if we can safely write this message to our permanent storage and drop it
-        from memory we have to determine if we already evaluated all the messages that this one can be conflicting with.
+    def clean_channels(self):
+        """Bookkeeping on the medium, keeping calculation of conflicts cheap.
 
-        If we determine that indeed this can be removed because we evaluated all conflicting later messages we drop this one and write it to a file.
-        Then we make a recursive call and try again with the next message in line.
-
-        Now what if we can't delete this yet, then we are smart and write the time that message end to our dictionary, so we'll only start to evaluate if 
-        we can clean this channel when that time has passed. This reduces the amount of unneeded computation greatly.
+        The medium evicts all transmissions that ended too long ago to conflict with any transmission that still has
+        to be delivered, see Channel.evict. When tracing, every evicted transmission gets written once to the trace
+        file with the nodes that heard it, so the full history of the medium is still available after the run.
         """
-        node_channel = self.channels[node]
-
-        if self.channel_cleaning_evaluation[node] >= self.counter or len(node_channel) == 0:
-            return
+        started = PhaseProfiler.start() if self.profiler is not None else None
+        evicted = self.medium.evict(self.counter)
 
-        first_message = node_channel[0]
-
-        # If we are not done yet ourself don't remove
-        if first_message.end_time >= self.counter:
-            self.channel_cleaning_evaluation[node] = first_message.end_time
-            return
-
-        conflicting_messages = simulator.find_conflicting_messages(first_message, node_channel)
-
-        # Checking if all messages are already evaluated, as in are there endtimes after the current time
-        safe_to_delete = True
-        message: Message
-        for message in conflicting_messages:
-            if (message.end_time >= self.counter):
-                safe_to_delete = False
-                # Small trick here to optimize when we run this expensive operation next, we will only come back when we can actually make a change.
-                self.channel_cleaning_evaluation[node] = message.end_time
-                break
+        if self.trace is not None:
+            transmission: Transmission
+            for transmission in evicted:
+                listeners = [self.nodes[listener].mac for listener in self.medium.listeners(transmission)]
+                self.trace.write(listeners, transmission.message, self.counter)
 
-        if safe_to_delete:
-            self.channel_files[node].write(f"{str(first_message)} deleted at: {self.counter} \n")
-            node_channel.pop(0)
-            self.clean_channels(node)
+        if self.profiler is not None:
+            self.profiler.stop("clean", started)
@@ -0,0 +1,22 @@
+import math
+import statistics
+from typing import Dict, List
+
+
+def summarize_replicas(replicas: List[Dict], confidence: float = 0.95) -> Dict:
+    """Mean and confidence interval of every metric over the get_stats results of replicas of the same scenario.
+
+    Returns a dictionary with the replicas themselves under 'replicas', the mean of every metric under 'mean' and the
+    (lower, upper) bound of its confidence interval under 'confidence_interval'. The interval uses the normal
+    approximation, with a single replica it is just the value itself.
+    """
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    mean = {}
+    confidence_interval = {}
+    for name in replicas[0]:
+        values = [stats[name] for stats in replicas]
+        mean[name] = statistics.fmean(values)
+        margin = z * statistics.stdev(values) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+        confidence_interval[name] = (mean[name] - margin, mean[name] + margin)
+
+    return {'replicas': replicas, 'mean': mean, 'confidence_interval': confidence_interval}
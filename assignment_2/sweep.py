@@ -0,0 +1,95 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+from mac_protocol.aloha import Aloha
+from mac_protocol.smac import SMAC
+from network.host import Host
+from result_store import ResultStore, code_version, config_hash
+from simulator import simulator
+
+# Node layout of the sweep, set once in every worker process by the pool initializer and only read after that.
+_layout: List[Tuple[int, int, int]] = []
+
+
+def generate_layout(number_of_nodes: int, ranges: [int, int], radius_node: [int, int],
+                    seed: int = 2) -> List[Tuple[int, int, int]]:
+    """Random (x, y, radius) for every node.
+
+    The same seed always gives the same nodes in the same order, so the layout for n nodes is the first n entries of
+    the layout for any larger number of nodes.
+    """
+    layout = []
+    random.seed(seed)
+
+    for id in range(number_of_nodes):
+        x = random.randint(0, ranges[0])
+        y = random.randint(0, ranges[1])
+        radius = random.randint(radius_node[0], radius_node[1])
+        layout.append((x, y, radius))
+
+    return layout
+
+
+def build_nodes(layout: Sequence[Tuple[int, int, int]], protocol: str, message_length: int,
+                send_freq_interval: [int, int]) -> List[Host]:
+    nodes = []
+    for id, (x, y, radius) in enumerate(layout):
+        if protocol == 'aloha':
+            algorithm = Aloha(message_length, send_freq_interval)
+        else:
+            algorithm = SMAC(send_freq_interval=send_freq_interval)
+        nodes.append(Host(id, x, y, radius, algorithm))
+
+    return nodes
+
+
+def init_worker(layout: List[Tuple[int, int, int]]):
+    global _layout
+    _layout = layout
+
+
+def run_point(point: Dict, seed: int) -> Dict:
+    """Runs a single sweep point with the given seed on the first number_of_nodes nodes of the shared layout.
+
+    A point is a dictionary with the keys number_of_nodes, protocol ('aloha' or 'smac'), message_length,
+    send_freq_interval and timeout.
+    """
+    nodes = build_nodes(_layout[:point['number_of_nodes']], point['protocol'], point['message_length'],
+                        point['send_freq_interval'])
+
+    random.seed(seed)
+    sim = simulator(nodes, point['timeout'], event_driven=True, trace_path=None)
+    sim.begin_loop()
+    return sim.get_stats()
+
+
+def run_sweep(points: List[Dict], layout: List[Tuple[int, int, int]], seeds: Sequence[int] = (0,),
+              workers: int = None, store: ResultStore = None) -> List[List[Dict]]:
+    """Runs every point once per seed on a pool of worker processes.
+
+    The layout is handed to every worker once when it starts instead of with every task. When a store is given, runs
+    that are already in it are loaded instead of simulated and new runs get added to it. Returns the get_stats
+    results per point, in the order of the points, each a list in the order of the seeds.
+    """
+    version = code_version()
+    keys = [[config_hash(layout[:point['number_of_nodes']], point, seed, version) for seed in seeds]
+            for point in points]
+    results = [[store.get(key) if store is not None else None for key in point_keys] for point_keys in keys]
+
+    to_run = [(point_index, seed_index) for point_index in range(len(points)) for seed_index in range(len(seeds))
+              if results[point_index][seed_index] is None]
+    if len(to_run) == 0:
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(layout,)) as pool:
+        futures = [pool.submit(run_point, points[point_index], seeds[seed_index])
+                   for point_index, seed_index in to_run]
+
+        for (point_index, seed_index), future in zip(to_run, futures):
+            stats = future.result()
+            results[point_index][seed_index] = stats
+            if store is not None:
+                store.put(keys[point_index][seed_index], points[point_index], seeds[seed_index], version, stats)
+
+    return results
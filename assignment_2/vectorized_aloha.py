@@ -0,0 +1,269 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from stats import summarize_replicas
+
+
+def build_adjacency(x: np.ndarray, y: np.ndarray, reach: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR adjacency (offsets, indices) where j is a neighbor of i when 0 < distance(i, j) <= reach[i].
+
+    Nodes are bucketed in a grid with cells the size of the largest reach, so all neighbors of a node are in the 3x3
+    block of cells around it. For each of the 9 cell offsets the candidate pairs are found with a binary search on
+    the sorted cell keys and then filtered on distance, everything as array operations.
+    """
+    number_of_nodes = len(x)
+    cell_size = max(float(reach.max()), 1.0)
+    cell_x = np.floor(x / cell_size).astype(np.int64)
+    cell_y = np.floor(y / cell_size).astype(np.int64)
+    # Shift so the neighboring cells of every node have non negative coordinates as well.
+    cell_x -= cell_x.min() - 1
+    cell_y -= cell_y.min() - 1
+    width = int(cell_y.max()) + 2
+    cell = cell_x * width + cell_y
+
+    order = np.argsort(cell, kind='stable')
+    sorted_cells = cell[order]
+
+    pairs_from = []
+    pairs_to = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = cell + dx * width + dy
+            lower = np.searchsorted(sorted_cells, target, side='left')
+            upper = np.searchsorted(sorted_cells, target, side='right')
+            counts = upper - lower
+
+            node = np.repeat(np.arange(number_of_nodes), counts)
+            within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            candidate = order[np.repeat(lower, counts) + within]
+
+            distance_squared = (x[node] - x[candidate]) ** 2 + (y[node] - y[candidate]) ** 2
+            keep = (distance_squared > 0) & (distance_squared <= reach[node] ** 2)
+            pairs_from.append(node[keep])
+            pairs_to.append(candidate[keep])
+
+    pairs_from = np.concatenate(pairs_from)
+    pairs_to = np.concatenate(pairs_to)
+    order = np.lexsort((pairs_to, pairs_from))
+
+    offsets = np.zeros(number_of_nodes + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(pairs_from, minlength=number_of_nodes))
+    return offsets, pairs_to[order]
+
+
+def tile_adjacency(offsets: np.ndarray, indices: np.ndarray, replicas: int) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR adjacency of replicas disjoint copies of a graph, node i of replica r gets index r * number_of_nodes + i."""
+    number_of_nodes = len(offsets) - 1
+    replica = np.arange(replicas)
+    tiled_offsets = np.append((offsets[:-1] + len(indices) * replica[:, None]).ravel(), len(indices) * replicas)
+    tiled_indices = (indices + number_of_nodes * replica[:, None]).ravel()
+    return tiled_offsets, tiled_indices
+
+
+class ReplicaStreams:
+    """Uniform numbers in [0, 1) from one generator per replica, taken for the nodes of all replicas at once.
+
+    Every generator fills a row of a block up front, so taking numbers is a single gather and the generators are only
+    called again when a row runs out. Uniform doubles take the same bits no matter how they are split over calls, so a
+    replica gets the same numbers in the same order as when it is run on its own.
+    """
+
+    def __init__(self, seeds: Sequence[int], nodes_per_replica: int, block: int):
+        self.generators = [np.random.default_rng(seed) for seed in seeds]
+        self.nodes_per_replica = nodes_per_replica
+        self.block = block
+        self.buffer = np.stack([generator.random(block) for generator in self.generators])
+        # Per replica how many numbers of its row were taken
+        self.used = np.zeros(len(seeds), dtype=np.int64)
+
+    def take(self, node: np.ndarray) -> np.ndarray:
+        """A number for every entry of node, which has to be sorted so the entries of a replica are together."""
+        replica = node // self.nodes_per_replica
+        counts = np.bincount(replica, minlength=len(self.generators))
+        if np.any(self.used + counts > self.block):
+            self.refill(int(counts.max()))
+
+        # Entry i is number i - first of its replica in this take, after the ones taken before.
+        first = np.cumsum(counts) - counts
+        values = self.buffer[replica, np.arange(len(node)) + (self.used - first)[replica]]
+        self.used += counts
+        return values
+
+    def refill(self, needed: int):
+        # The rest of every row moves to the front of a new block, which grows when a single take needs more.
+        block = max(self.block, 2 * needed)
+        buffer = np.empty((len(self.generators), block))
+        for replica, generator in enumerate(self.generators):
+            rest = self.buffer[replica, self.used[replica]:]
+            buffer[replica, :len(rest)] = rest
+            buffer[replica, len(rest):] = generator.random(block - len(rest))
+        self.buffer = buffer
+        self.block = block
+        self.used[:] = 0
+
+
+def simulate_aloha(layout: Sequence[Tuple[float, float, float]], timeout: int, message_length: int,
+                   send_freq_interval: [int, int], seed: int = None, window: int = None) -> Dict:
+    """Pure ALOHA on the given (x, y, reach) layout as array operations, returns the same metrics as get_stats.
+
+    This follows the rules of the Aloha protocol and the simulator instead of stepping through rounds:
+    - A node decides on its first message in round 0 and on every next one two rounds after the previous one
+      started. Every start is the previous start plus a uniform random wait in send_freq_interval, every message
+      goes to a random neighbor, nodes without neighbors never send.
+    - A message is delivered in the round before it ends, unless another message to the same node ends in the same
+      round (all of those fail) or the receiver hears any other message overlapping it (this one fails).
+
+    Time is processed in windows, only the messages starting in the current window and the windows around it are
+    in memory at once. Because random numbers come from NumPy the results are statistically equal to those of the
+    simulator, not identical. The simulator also postpones a decision by a round when a message arrives in that
+    round, which only matters for messages right at the timeout and is not modelled here.
+    """
+    return simulate_aloha_replicas(layout, timeout, message_length, send_freq_interval, 1, window=window,
+                                   seeds=[seed])['replicas'][0]
+
+
+def simulate_aloha_replicas(layout: Sequence[Tuple[float, float, float]], timeout: int, message_length: int,
+                            send_freq_interval: [int, int], replicas: int, seed: int = None, window: int = None,
+                            confidence: float = 0.95, seeds: Sequence[int] = None) -> Dict:
+    """Runs replicas independent runs of simulate_aloha on the same layout at once.
+
+    The replicas are disjoint copies of the network in one big graph, so every array operation advances all of them
+    together and the cost per replica shrinks as they are added. Every replica draws from its own generator, seeded
+    with its entry in seeds or else with a seed spawned from seed, in blocks (see ReplicaStreams). Replica i gives the
+    same result as simulate_aloha with seed seeds[i] no matter how many replicas run with it. Returns the get_stats metrics of every
+    replica under 'replicas', their mean and confidence interval (see summarize_replicas) and the seeds under 'seeds'.
+    """
+    low, high = send_freq_interval
+    if low < 1:
+        raise ValueError("The send interval has to be at least a round")
+    if replicas < 1:
+        raise ValueError("At least one replica has to be run")
+    if seeds is None:
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(replicas)]
+    elif len(seeds) != replicas:
+        raise ValueError("Every replica needs its own seed")
+
+    x, y, reach = (np.asarray(column, dtype=np.float64) for column in zip(*layout))
+    nodes_per_replica = len(x)
+    offsets, indices = build_adjacency(x, y, reach)
+    average_neighbours = float(np.diff(offsets).mean())
+    offsets, indices = tile_adjacency(offsets, indices, replicas)
+    number_of_nodes = nodes_per_replica * replicas
+    degree = np.diff(offsets)
+
+    window = window if window is not None else max(1024, 2 * message_length)
+    # A window takes about two numbers per message, so a block lasts a few windows.
+    streams = ReplicaStreams(seeds, nodes_per_replica, max(4096, 4 * nodes_per_replica * (window // low + 1)))
+
+    def wait(node):
+        """Uniform random wait in send_freq_interval for the given nodes."""
+        return low + (streams.take(node) * (high - low + 1)).astype(np.int64)
+
+    # Per node the start of the last message and the next one
+    previous_start = np.full(number_of_nodes, -2, dtype=np.int64)
+    next_start = wait(np.arange(number_of_nodes))
+
+    def generate(window_end):
+        """All messages starting before window_end that were not generated yet.
+
+        Returned as arrays of (sender, start, destination, round the message was decided on).
+        """
+        senders, starts, decisions, choices = [], [], [], []
+        while True:
+            active = np.flatnonzero((next_start < window_end) & (previous_start + 2 < timeout))
+            if active.size == 0:
+                break
+            senders.append(active)
+            starts.append(next_start[active])
+            decisions.append(previous_start[active] + 2)
+            # Which neighbor gets the message, drawn while active is still sorted by node.
+            choices.append(streams.take(active))
+            previous_start[active] = next_start[active]
+            next_start[active] += wait(active)
+
+        empty = np.zeros(0, dtype=np.int64)
+        sender = np.concatenate(senders) if senders else empty
+        start = np.concatenate(starts) if starts else empty
+        decision = np.concatenate(decisions) if decisions else empty
+        choice = np.concatenate(choices) if choices else np.zeros(0)
+
+        # Without neighbors there is no message, the node does keep its timing.
+        has_neighbors = degree[sender] > 0
+        sender, start, decision = sender[has_neighbors], start[has_neighbors], decision[has_neighbors]
+        destination = indices[offsets[sender] + (choice[has_neighbors] * degree[sender]).astype(np.int64)]
+        return sender, start, destination, decision
+
+    # Keys are listener * key_range + start, shifted by the message length so range queries never go negative.
+    key_range = timeout + high + 2 * window + 2 * message_length + 2
+    total_send = np.zeros(replicas, dtype=np.int64)
+    total_failed = np.zeros(replicas, dtype=np.int64)
+    total_successful = np.zeros(replicas, dtype=np.int64)
+
+    previous = generate(0)
+    current = generate(window)
+    window_start = 0
+    while len(current[0]) > 0 or np.any(previous_start + 2 < timeout):
+        upcoming = generate(window_start + 2 * window)
+        sender, start, destination, decision = (np.concatenate(parts) for parts in zip(previous, current, upcoming))
+        end = start + message_length
+
+        # Every message is heard by its sender and all neighbors of the sender. Only the messages that can overlap
+        # with one starting in the current window matter here.
+        nearby = np.flatnonzero((start >= window_start - message_length) &
+                                (start <= window_start + window + message_length))
+        listener_counts = degree[sender[nearby]] + 1
+        message = np.repeat(nearby, listener_counts)
+        within = np.arange(listener_counts.sum()) - np.repeat(np.cumsum(listener_counts) - listener_counts,
+                                                               listener_counts)
+        neighbor = indices[np.minimum(offsets[sender[message]] + within - 1, len(indices) - 1)]
+        listener = np.where(within == 0, sender[message], neighbor)
+        heard = np.sort(listener * key_range + start[message] + message_length)
+
+        # Messages to the same node ending in the same round, all messages have the same length so they are in the
+        # same window.
+        group_keys, group_sizes = np.unique(destination * key_range + end, return_counts=True)
+
+        # Only the messages starting in the current window get evaluated
+        in_current = np.arange(len(previous[0]), len(previous[0]) + len(current[0]))
+        total_send += np.bincount(sender[in_current] // nodes_per_replica, minlength=replicas)
+        delivered_in = end[in_current] - 1
+        evaluate = in_current[(decision[in_current] <= delivered_in) & (delivered_in < timeout)]
+        # Binary searches are a lot faster with sorted queries
+        evaluate = evaluate[np.argsort(destination[evaluate] * key_range + end[evaluate], kind='stable')]
+
+        group_size = group_sizes[np.searchsorted(group_keys, destination[evaluate] * key_range + end[evaluate])]
+        collided = group_size > 1
+
+        # Everything the receiver hears that starts in [start - length, end] overlaps, the message itself included.
+        base = destination[evaluate] * key_range + message_length
+        overlapping = (np.searchsorted(heard, base + end[evaluate], side='right') -
+                       np.searchsorted(heard, base + start[evaluate] - message_length, side='left'))
+        blocked = ~collided & (overlapping > 1)
+
+        replica = sender[evaluate] // nodes_per_replica
+        total_failed += np.bincount(replica[collided | blocked], minlength=replicas)
+        total_successful += np.bincount(replica[~collided & ~blocked], minlength=replicas)
+
+        previous, current = current, upcoming
+        window_start += window
+
+    results = []
+    for send, failed, successful in zip(total_send.tolist(), total_failed.tolist(), total_successful.tolist()):
+        if send == 0:
+            successful_percentage = 0
+            failed_percentage = 0
+        else:
+            successful_percentage = successful / send
+            failed_percentage = failed / send
+
+        results.append({'average neighbours': average_neighbours,
+                        'total_failed': failed,
+                        'total_successful': successful,
+                        'total_send': send,
+                        'successful_percentage': successful_percentage,
+                        'failed_percentage': failed_percentage})
+
+    summary = summarize_replicas(results, confidence)
+    summary['seeds'] = seeds
+    return summary
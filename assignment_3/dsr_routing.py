@@ -7,7 +7,8 @@ def dsr_routing(neighbors, message):
             message.end_time = message.start_time + 2
         # if message.type == "Known route":
         #     print("Known route sent")
-        message.destination = [message.route.pop()]
+        message.destination = [message.route.last()]
+        message.route = message.route.without_last()
     else:
         direct_targets = []
         for each in neighbors:
@@ -1,16 +1,17 @@
 from collections.abc import Sequence
-import weakref
 import math
 import random
 from copy import deepcopy, copy
 from typing import Any, Callable, Dict, List
 
 from assignment_3.dsr_routing import dsr_routing
-from message import Message
+from message import EMPTY_ROUTE, Message, Route
+from route_cache import RouteCache, SeenIds
 
 
 class Host:
-    _instances = set()  # atribute protect to save all instances of host
+    # World of the simulation this host is part of, will get registered by the simulator.
+    world = None
 
     # message queue that the simulator can use to deposit messages into.
     message_queue: List[Message] 
@@ -25,7 +26,9 @@ class Host:
         self.mac = mac
         self.positionx = x
         self.positiony = y
-        self._instances.add(weakref.ref(self))
+        # Keeps our neighbors up to date from predicted link changes when the simulator has one,
+        # see kinetic.KineticNeighborTracker. Without one the grid gets searched every time.
+        self.tracker = None
         self.routing_algorithm = routing_algorithm
         self.metrics = {
                 "messages received": 0,
@@ -38,6 +41,7 @@ class Host:
                 "highest ttl": 0,
                 "lowest ttl": 0,
                 "messages stranded": 0,
+                "duplicates dropped": 0,
             }
         self.message_queue = []
         self.movement_frequency = movement_frequency
@@ -45,8 +49,11 @@ class Host:
 
         self.timestamp_until_sending = 0
 
-        # Movement related variables
+        # Movement related variables, a move goes from the origin in steps of dx, dy for move_turns_total turns.
         self.move_turns_remaining = 0
+        self.move_turns_total = 0
+        self.move_origin_x = x
+        self.move_origin_y = y
         self.dx = 0
         self.dy = 0
 
@@ -59,25 +66,18 @@ class Host:
 
         self.message_out_for_delivery: Message = None 
         self.message_out_queue = []
-        self.message_lines = None
-
-        # DSR
-        self.passed_ids = []
-        self.known_routes = []
-
-    @classmethod  # to list all instances of host class
-    def get_instances(cls):
-        dead = set()
-        for ref in cls._instances:
-            obj = ref()
-            if obj is not None:
-                yield obj
-            else:
-                dead.add(ref)
-        cls._instances -= dead
+        # Node we are currently transmitting to, renderers draw a line to it.
+        self.active_link = None
+
+        # DSR, routes we found per destination and the ids we already answered with a ReRequest, both bounded.
+        self.passed_ids = SeenIds()
+        self.known_routes = RouteCache()
+        # Floods we have already seen, by (source mac, message id). Every flood is handled at most once. Copies stop
+        # coming in after at most TTL hops of up to 15 rounds each, so they can be forgotten after that.
+        self.seen_floods = SeenIds(capacity=10000, max_age=Message.default_ttl * 16)
 
     # Evaluates a single round, checks if there is a message to handle else just go to the algorithm.
-    def evaluate_round(self, round_counter, canvas, message_id):
+    def evaluate_round(self, round_counter, message_id):
         
         # Evaluate our incoming messages
         messages_to_forward = []
@@ -85,20 +85,18 @@ class Host:
             message: Message
             message = self.message_queue.pop()
 
+            # Copies of a flood we already handled are dropped, otherwise they circulate until their TTL runs out.
+            if self.is_flood(message) and not self.seen_floods.add(self.flood_key(message), round_counter):
+                self.metrics["duplicates dropped"] += 1
+                continue
+
             # So if the message is not a re-request, and it reaches its destinations it will send a ReRequest message
             # back to its source
             if message.end_destination == self:
                 # If the message type was a rerequest, save the route in the known routes variable, ONly the first route
                 # of a certain id gets saved.
                 if message.type == "ReRequest" and len(message.route) > 0 and self.routing_algorithm == dsr_routing:
-                    route_found = False
-                    for known_route in self.known_routes:
-                        if known_route[0] == message.source:
-                            route_found = True
-
-                    if not route_found:
-                        new_route = [message.source, message.request_route]
-                        self.known_routes.append(new_route)
+                    if self.known_routes.add(message.source, message.request_route, round_counter):
                         print("New route found")
 
                 # If a message that has been received comes in that was not a known route, send a rerequest message
@@ -107,12 +105,10 @@ class Host:
                         and self.routing_algorithm == dsr_routing:
                     self.metrics["messages received"] += 1
                     self.incorporate_ttl(message)
-                    self.passed_ids.append(message_id)
+                    self.passed_ids.add(message_id)
                     # print("Normal route done")
 
-                    message.route.append(self)
-                    message.request_route = message.route.copy()  # Route that is saved
-                    message.route.pop()
+                    message.request_route = message.route.append(self)  # Route that is saved
                     message.end_destination = message.source
                     message.source = self
                     message.type = "ReRequest"
@@ -141,6 +137,8 @@ class Host:
         if return_message is not None and return_message.end_destination is not None:
             # Routing algorithm basically only has to set the current destination(s), for broadcast just use all the current
             # neighbors.
+            if self.is_flood(return_message):
+                self.seen_floods.add(self.flood_key(return_message), round_counter)
 
             self.message_out_queue.append(return_message)
 
@@ -155,26 +153,29 @@ class Host:
             message_to_forward.start_time = round_counter
             # Decrease TTL
             message_to_forward.ttl -= 1
-            message_to_forward.route.append(self)
+            message_to_forward.route = message_to_forward.route.append(self)
 
             self.message_out_queue.append(message_to_forward)
 
         # Try do deliver our messages that are out for delivery, we basically check if our destinations are still in reach.
-        self.try_to_deliver_messages(round_counter, canvas)
+        self.try_to_deliver_messages(round_counter)
 
         # Done with our round except for moving, we do that later to make sure everyone is working with the same positions.
         return message_id
 
 
-    # Here we either continue moving or calculate a new move.
+    # Here we either continue moving or calculate a new move, returns True when we picked a new move.
     def evaluate_moving(self):
         if self.move_turns_remaining < 1:
             if self.movement_frequency > random.random():
                 self.pick_next_move()
+                return True
         else:
-            self.positiony += self.dy
-            self.positionx += self.dx
+            # Position straight from the origin of the move, so it can be computed for any round in advance
             self.move_turns_remaining -= 1
+            moved = self.move_turns_total - self.move_turns_remaining
+            self.set_position(self.move_origin_x + moved * self.dx, self.move_origin_y + moved * self.dy)
+        return False
 
 
 
@@ -191,7 +192,10 @@ class Host:
         speed_in_turns = random.randint(500, 2000)
         
         self.move_turns_remaining = speed_in_turns
-        
+        self.move_turns_total = speed_in_turns
+        self.move_origin_x = self.positionx
+        self.move_origin_y = self.positiony
+
         self.dy = (new_y - self.positiony)/speed_in_turns
         self.dx = (new_x - self.positionx)/speed_in_turns
 
@@ -200,7 +204,7 @@ class Host:
 
     # We keep track of our neighbors and try to deliver our message, if the destination nodes are out of our
     # range this is no longer a target, if we lose all targets sending the message failed.
-    def try_to_deliver_messages(self, round_counter, canvas):
+    def try_to_deliver_messages(self, round_counter):
         if len(self.message_out_queue) > 0 and self.message_out_for_delivery is None:
             neighbors_in_reach = self.get_neighbors()
             self.message_out_for_delivery = self.message_out_queue.pop() 
@@ -221,7 +225,7 @@ class Host:
                     # Our dest is no longer in reach, remove it from our message destination cause it failed.
                     if dest in neighbors_in_reach == False:
                         message.destination.remove(dest)
-                        self.delete_line(canvas, message, dest)
+                        self.clear_link()
                         if len(message.destination) < 1:
 
                             # We failed delivery completely, time to do book keeping.
@@ -234,18 +238,19 @@ class Host:
                     else: 
                         # We succeeded in delivering/forwarding our message, do book keeping.
                         if round_counter > message.end_time:
-                            dest.message_queue.append(message)
+                            # Every receiver gets its own envelope, the route in it is shared
+                            dest.message_queue.append(message.copy())
                             message.destination.remove(dest)
 
                             metrics_string = "forward-messages sent"
                             if message.source == self:
                                 metrics_string = "messages sent"
                             self.metrics[metrics_string] += 1
-                            self.delete_line(canvas)
+                            self.clear_link()
 
                         # We are still in reach and can keep delivering.
                         else:
-                            self.draw_line(canvas, message, dest)
+                            self.set_link(dest)
                         continue
                             
                         
@@ -257,18 +262,17 @@ class Host:
                         metrics_string = "messages failed"
                     self.metrics[metrics_string] += 1
                 
-                self.delete_line(canvas)
+                self.clear_link()
                 self.message_out_for_delivery = None 
 
 
                 
-    def draw_line(self, canvas, message: Message, destination):
-            self.delete_line(canvas)
-            self.message_lines = canvas.create_line(self.positionx, self.positiony, destination.positionx, destination.positiony, fill='green', width=3)
-            
+    # Only remember who we are sending to, drawing is up to the renderer if there is one.
+    def set_link(self, destination):
+        self.active_link = destination
 
-    def delete_line(self, canvas):
-            canvas.delete(self.message_lines)
+    def clear_link(self):
+        self.active_link = None
 
 
     # Incorporate TTL for a message successfully received we are going to store the metrics.
@@ -292,26 +296,46 @@ class Host:
     # Decide randomly if you will send a message
     def decide_to_send_message(self, round_counter, message_id):
         if self.message_chance > random.random():
-            end_destination = random.choice(list(self._instances))()
+            end_destination = self.world.random_node()
             if end_destination != self:
                 end_time = round_counter + random.randint(10, 15)
                 self.timestamp_until_sending = end_time
                 message_id += 1
-                # routes_to_take = self.known_routes.copy()
-                for known_route in self.known_routes:
-                    if known_route[0] == end_destination:
-                        # own_host = known_route[1][0]
-                        route = known_route[1][0:-2]
-                        destination = known_route[1][-2]
-                        return Message(self, destination, end_destination, round_counter, end_time,
-                               "random message", message_id, route, None, "Known route"), message_id
-
-                return Message(self, None, end_destination, round_counter, end_time,
-                               "random message", message_id, [self], None, "Packet Discovery"), message_id
+                known_route = self.known_routes.get(end_destination, round_counter)
+                # A route with a hop that went out of reach is of no use anymore, find a new one.
+                if known_route is not None and not self.route_is_intact(known_route):
+                    self.known_routes.invalidate(end_destination)
+                    known_route = None
+
+                if known_route is not None:
+                    # Without the destination, the hop before it is the last one
+                    route = known_route.without_last().without_last()
+                    destination = known_route.without_last().last()
+                    return Message(self, destination, end_destination, round_counter, end_time,
+                           "random message", message_id, route, None, "Known route"), message_id
+
+                return Message(self, None, end_destination, round_counter, end_time, "random message", message_id,
+                               EMPTY_ROUTE.append(self), None, "Packet Discovery"), message_id
 
         return None, message_id
 
 
+    @staticmethod
+    def is_flood(message: Message):  # messages without a route go to all neighbors, broadcast and DSR discovery
+        return message.type == "Packet Discovery"
+
+    @staticmethod
+    def flood_key(message: Message):
+        return message.source.mac, message.message_id
+
+    @staticmethod
+    def route_is_intact(route: Route):  # check if every hop of a route can still reach the next one
+        hops = list(route)
+        for hop, next_hop in zip(hops, hops[1:]):
+            if not hop.is_reacheable(next_hop):
+                return False
+        return True
+
     def is_reacheable(self, neighbor):  # check if neighbor host is reacheable
         first_part = ((self.positionx - neighbor.positionx) ** 2)
         second_part = ((self.positiony - neighbor.positiony) ** 2)
@@ -323,10 +347,18 @@ class Host:
             return distance <= self.reach  # returns true if is reacheable
 
     def get_neighbors(self):  # get all neighbors of a host
+        if self.tracker is not None:
+            return self.tracker.get_neighbors(self)
+        if self.world is None:
+            return []
+
         neighbors = []
-        for obj in Host.get_instances():
+        # Only the hosts in the grid cells around us can be in reach
+        for obj in self.world.grid.query(self.positionx, self.positiony, self.reach):
             if (self.is_reacheable(obj)):  # check if a node is reacheable
                 neighbors.append(obj)  # add to the list of neighbors
+        # In the order of the world, the order of the grid cells depends on their size
+        neighbors.sort(key=self.world.index_of.get)
         return neighbors  # returns the list
 
     def get_mac(self):  # returns the mac address
@@ -341,6 +373,15 @@ class Host:
     def get_reach(self):  # returns the reach
         return self.reach
 
+    def set_position(self, x: float, y: float):  # moves the host, keeping the spatial index up to date
+        self.positionx = x
+        self.positiony = y
+        if self.world is not None:
+            self.world.grid.move(self, x, y)
+
+    def set_world(self, world):
+        self.world = world
+
     def set_channels(self, channels):
         self.channels = channels
 
@@ -0,0 +1,223 @@
+import heapq
+import math
+from typing import List, Set
+
+import numpy as np
+
+from host import Host
+
+# Kinds of events, a link of a pair of nodes may have changed or the move of a node ended.
+EVENT_LINK = 0
+EVENT_SEGMENT_END = 1
+
+
+class KineticNeighborTracker:
+    """Keeps the neighbors of every node up to date by predicting when links come up and go down.
+
+    Nodes move in straight lines: from the round after a move got picked, a node is at move_origin + k * (dx, dy)
+    after k of its move_turns_total steps and stands still after the last one (see Host.evaluate_moving). So for every
+    pair the distance is a quadratic function of time until one of them changes trajectory, and the round in which a
+    node comes into or goes out of reach follows from its roots. Those rounds are kept in a priority queue, the
+    simulator advances the tracker every round and only the links with an event get checked. When a node picks a
+    new move (or stops) only its own pairs are predicted again, events of its old trajectory are recognized by the
+    version of the trajectory they were predicted with and skipped.
+
+    The positions are computed exactly like the hosts do, and every event is checked against the same distance test
+    as Host.is_reacheable, so the neighbor sets are the same as a search every round would give. Events are scheduled
+    a round before the predicted crossing and checked again until it happened, so rounding in the roots never makes
+    the tracker late.
+    """
+
+    def __init__(self, nodes: List[Host], round_counter: int = 0):
+        self.nodes = nodes
+        self.index_of = {node: index for index, node in enumerate(nodes)}
+        number_of_nodes = len(nodes)
+
+        self.reach = np.array([node.reach for node in nodes], dtype=np.float64)
+        # Current segment per node: origin, step per round, first round of the segment and its number of steps.
+        self.origin_x = np.array([node.positionx for node in nodes], dtype=np.float64)
+        self.origin_y = np.array([node.positiony for node in nodes], dtype=np.float64)
+        self.dx = np.zeros(number_of_nodes, dtype=np.float64)
+        self.dy = np.zeros(number_of_nodes, dtype=np.float64)
+        self.start = np.full(number_of_nodes, round_counter, dtype=np.int64)
+        self.length = np.zeros(number_of_nodes, dtype=np.int64)
+        self.version = [0] * number_of_nodes
+
+        # neighbors[i] holds j when j is within reach of i, heard_by[j] then holds i.
+        self.neighbors: List[Set[int]] = [set() for _ in range(number_of_nodes)]
+        self.heard_by: List[Set[int]] = [set() for _ in range(number_of_nodes)]
+        self.events = []
+        self.changed: List[int] = []
+        self.round_counter = round_counter
+
+        # Every pair once
+        for index in range(number_of_nodes):
+            self.predict(index, np.arange(index + 1, number_of_nodes), round_counter)
+
+    def position(self, indexes, round_counter: int):
+        """Positions of the nodes in the given round, as Host.evaluate_moving computes them."""
+        moved = np.clip(round_counter - self.start[indexes], 0, self.length[indexes]).astype(np.float64)
+        return self.origin_x[indexes] + moved * self.dx[indexes], self.origin_y[indexes] + moved * self.dy[indexes]
+
+    def in_reach(self, index: int, others: np.ndarray, round_counter: int):
+        """(others within reach of index, index within reach of others) in the given round, like Host.is_reacheable."""
+        x, y = self.position(index, round_counter)
+        other_x, other_y = self.position(others, round_counter)
+        distance = np.sqrt((x - other_x) ** 2 + (y - other_y) ** 2)
+        return (distance > 0) & (distance <= self.reach[index]), (distance > 0) & (distance <= self.reach[others])
+
+    def segment_end(self, indexes) -> np.ndarray:
+        """First round in which the nodes stand still, at or before the current round for nodes that already do."""
+        return self.start[indexes] + self.length[indexes]
+
+    def predict(self, index: int, others: np.ndarray, round_counter: int):
+        """Sets the links between index and others for this round and schedules the next round they may change.
+
+        Others are either all other nodes or all nodes with a higher index.
+        """
+        if len(others) == 0:
+            return
+        forward, backward = self.in_reach(index, others, round_counter)
+        lowest_other = int(others[0]) if others[0] > index else 0
+
+        # Only the links that are there now or were there before have to be looked at.
+        forward_set = set(others[forward].tolist())
+        for other in [other for other in self.neighbors[index] if other >= lowest_other and other not in forward_set]:
+            self.set_link(index, other, False)
+        for other in forward_set:
+            self.set_link(index, other, True)
+
+        backward_set = set(others[backward].tolist())
+        for other in [other for other in self.heard_by[index] if other >= lowest_other and other not in backward_set]:
+            self.set_link(other, index, False)
+        for other in backward_set:
+            self.set_link(other, index, True)
+
+        # Relative position and velocity from this round until one of the two changes trajectory.
+        x, y = self.position(index, round_counter)
+        other_x, other_y = self.position(others, round_counter)
+        moving = round_counter < self.segment_end(index)
+        other_moving = round_counter < self.segment_end(others)
+        velocity_x = np.where(other_moving, self.dx[others], 0.0) - (self.dx[index] if moving else 0.0)
+        velocity_y = np.where(other_moving, self.dy[others], 0.0) - (self.dy[index] if moving else 0.0)
+        offset_x = other_x - x
+        offset_y = other_y - y
+
+        horizon = np.where(other_moving, self.segment_end(others), np.iinfo(np.int64).max)
+        if moving:
+            horizon = np.minimum(horizon, self.segment_end(index))
+
+        for reach, linked, direction in ((self.reach[index], forward, 0), (self.reach[others], backward, 1)):
+            crossing = self.next_crossing(offset_x, offset_y, velocity_x, velocity_y, reach, linked)
+            # Check a round early, the exact test decides when the link really changes.
+            check_round = round_counter + np.maximum(crossing - 1, 1)
+            scheduled = np.isfinite(crossing) & (check_round < horizon)
+            for other, check in zip(others[scheduled].tolist(), check_round[scheduled].tolist()):
+                source, target = (index, other) if direction == 0 else (other, index)
+                heapq.heappush(self.events, (int(check), EVENT_LINK, source, target, self.version[source],
+                                             self.version[target]))
+
+    @staticmethod
+    def next_crossing(offset_x, offset_y, velocity_x, velocity_y, reach, linked) -> np.ndarray:
+        """Rounds from now until the distance crosses reach, infinity when it doesn't.
+
+        Solves |offset + t * velocity| = reach for t. A linked pair leaves at the larger root, an unlinked pair
+        enters at the smaller one when that is still ahead.
+        """
+        a = velocity_x ** 2 + velocity_y ** 2
+        b = 2 * (offset_x * velocity_x + offset_y * velocity_y)
+        c = offset_x ** 2 + offset_y ** 2 - reach ** 2
+        discriminant = b ** 2 - 4 * a * c
+        crossing = np.full(len(offset_x), np.inf)
+
+        valid = (a > 0) & (discriminant >= 0)
+        root = np.sqrt(np.where(valid, discriminant, 0.0))
+        safe_a = np.where(valid, a, 1.0)
+        first = (-b - root) / (2 * safe_a)
+        second = (-b + root) / (2 * safe_a)
+
+        leaving = valid & linked
+        crossing[leaving] = np.floor(np.maximum(second[leaving], 0)) + 1
+        entering = valid & ~linked & (second > 0)
+        crossing[entering] = np.maximum(np.ceil(first[entering]), 1)
+        return crossing
+
+    def set_link(self, source: int, target: int, linked: bool):
+        if linked:
+            self.neighbors[source].add(target)
+            self.heard_by[target].add(source)
+        else:
+            self.neighbors[source].discard(target)
+            self.heard_by[target].discard(source)
+
+    def trajectory_changed(self, node: Host, round_counter: int):
+        """The node picked a new move in the move phase of round_counter, it starts from the next round."""
+        index = self.index_of[node]
+        self.origin_x[index] = node.move_origin_x
+        self.origin_y[index] = node.move_origin_y
+        self.dx[index] = node.dx
+        self.dy[index] = node.dy
+        self.start[index] = round_counter + 1
+        self.length[index] = node.move_turns_total
+        self.changed.append(index)
+
+    def repredict(self, index: int, round_counter: int):
+        """Links and events of the node from its current trajectory on, its old events get outdated."""
+        self.version[index] += 1
+        others = np.flatnonzero(np.arange(len(self.nodes)) != index)
+        self.predict(index, others, round_counter)
+
+        end = int(self.segment_end(index))
+        if end > round_counter:
+            heapq.heappush(self.events, (end, EVENT_SEGMENT_END, index, -1, self.version[index], 0))
+
+    def advance(self, round_counter: int):
+        """Brings the neighbor sets to the given round, call before the nodes get evaluated in that round."""
+        self.round_counter = round_counter
+        for index in self.changed:
+            self.repredict(index, round_counter)
+        self.changed = []
+
+        events = self.events
+        while len(events) > 0 and events[0][0] <= round_counter:
+            _, kind, source, target, source_version, target_version = heapq.heappop(events)
+            if source_version != self.version[source]:
+                continue
+
+            if kind == EVENT_SEGMENT_END:
+                self.repredict(source, round_counter)
+                continue
+
+            if target_version != self.version[target]:
+                continue
+            # Check this pair again from now, which also schedules its next change.
+            self.predict_pair(source, target, round_counter)
+
+    def predict_pair(self, source: int, target: int, round_counter: int):
+        """Link from source to target in this round and the next round it may change."""
+        forward, _ = self.in_reach(source, np.array([target]), round_counter)
+        linked = bool(forward[0])
+        self.set_link(source, target, linked)
+
+        x, y = self.position(source, round_counter)
+        target_x, target_y = self.position(np.array([target]), round_counter)
+        velocity = []
+        for index in (source, target):
+            moving = round_counter < self.segment_end(index)
+            velocity.append((self.dx[index] if moving else 0.0, self.dy[index] if moving else 0.0))
+        horizon = min(int(self.segment_end(index)) if round_counter < self.segment_end(index) else math.inf
+                      for index in (source, target))
+
+        crossing = self.next_crossing(target_x - x, target_y - y, np.array([velocity[1][0] - velocity[0][0]]),
+                                      np.array([velocity[1][1] - velocity[0][1]]), self.reach[source],
+                                      np.array([linked]))[0]
+        if math.isfinite(crossing):
+            check_round = round_counter + max(int(crossing) - 1, 1)
+            if check_round < horizon:
+                heapq.heappush(self.events, (check_round, EVENT_LINK, source, target, self.version[source],
+                                             self.version[target]))
+
+    def get_neighbors(self, node: Host) -> List[Host]:
+        """Neighbors of the node in the current round, in the order of the nodes list."""
+        nodes = self.nodes
+        return [nodes[index] for index in sorted(self.neighbors[self.index_of[node]])]
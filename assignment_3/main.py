@@ -1,17 +1,19 @@
 import random
+import sys
 import time
 from typing import List
 
 from assignment_3.dsr_routing import dsr_routing
 from broadcast_routing import broadcast_routing
 from matplotlib import pyplot as plt
-import tkinter as tk
 
 from host import Host
+from kinetic import KineticNeighborTracker
+from mobility import MobilityEngine, RandomWaypoint
 from simulator import simulator
 
 
-def main():
+def main(headless: bool = False, vectorized_mobility: bool = False):
     print("Starting main function")
     # Seed we need for tests of different algos
     seed = None
@@ -20,19 +22,28 @@ def main():
     # Create nodes here
     nodes = configure_nodes(10, [250, 250], 150, algorithm, 0.2, 0.5)
 
-    # Start tkinter
-    window = tk.Tk()
-    window.title("Routing simulator")
-    canvas = tk.Canvas(window, width=510, height=510)
-    canvas.configure(background="grey")
-    canvas.pack()
-    dot_dict = create_dots_on_canvas(nodes, canvas)
+    # Start tkinter, headless runs don't draw anything and don't need a display
+    renderer = None
+    if not headless:
+        from renderer import TkRenderer
+        renderer = TkRenderer(nodes, fps=30)
 
-    # Simulator is started here with a large timeout
-    sim = simulator(nodes, 10000, window, canvas, dot_dict)
+    # Moves all nodes at once with NumPy, with None every node moves itself
+    mobility = MobilityEngine(nodes, RandomWaypoint()) if vectorized_mobility else None
+
+    # Keeps neighbors up to date from predicted link changes, with None nodes search for them every time
+    tracker = KineticNeighborTracker(nodes)
+
+    # Simulator is started here with a large timeout.
+    # Pass profiler=PhaseProfiler() (from profiler) to get a breakdown of where the time goes.
+    sim = simulator(nodes, 10000, renderer, mobility=mobility, tracker=tracker)
 
     started_calc = time.time()
-    sim.begin_loop()
+    if renderer is None:
+        sim.begin_loop()
+    else:
+        # The window runs alongside the simulation and only shows a snapshot now and then
+        renderer.run(sim)
     ended_calc = time.time()
 
     print(f"Calculation time {format(ended_calc - started_calc, '.4f')}")
@@ -55,24 +66,5 @@ def configure_nodes(number_of_nodes: int, ranges: List[int], max_radius: int, ro
 
     return nodes
 
-def create_dots_on_canvas(nodes: List[Host], canvas):
-    dot_dict = {}
-    node: Host
-    for node in nodes:
-        dot_dict[node] = create_dot(node, canvas)
-
-    return dot_dict
-
-def create_dot(node: Host, canvas):
-
-    fill_color = "#{:02x}{:02x}{:02x}".format(
-        random.randint(0, 255),
-        random.randint(0, 255),
-        random.randint(0, 255)
-    )  
-
-    dot = canvas.create_oval(node.positionx-5, node.positiony-5, node.positionx+5, node.positiony+5, fill=fill_color)
-    return dot
-
 if __name__ == '__main__':
-    main()
+    main(headless='--headless' in sys.argv, vectorized_mobility='--vectorized-mobility' in sys.argv)
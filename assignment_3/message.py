@@ -1,3 +1,47 @@
+from copy import copy
+
+
+class Route:
+    """Immutable list of hops, the first hop is where the route starts.
+
+    A route is its last hop plus the route before it, so appending a hop makes a new route that shares every earlier
+    hop with the one it was made from, and taking the last hop off just returns that earlier route. Both are O(1)
+    whatever the length, and routes that branched off the same prefix never see each other's hops.
+    """
+    __slots__ = ('hop', 'previous', 'length')
+
+    def __init__(self, hop=None, previous: 'Route' = None):
+        self.hop = hop
+        self.previous = previous
+        # Only the empty route has no previous one
+        self.length = 0 if previous is None else len(previous) + 1
+
+    def append(self, hop) -> 'Route':
+        return Route(hop, self)
+
+    def last(self):
+        return self.hop
+
+    def without_last(self) -> 'Route':
+        return self.previous
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self):
+        hops = []
+        route = self
+        while route.length > 0:
+            hops.append(route.hop)
+            route = route.previous
+        return reversed(hops)
+
+    def __str__(self):
+        return f"[{', '.join(str(hop) for hop in self)}]"
+
+
+EMPTY_ROUTE = Route()
+
 
 class Message:
     message_id = 0
@@ -25,6 +69,16 @@ class Message:
         self.type = type
 
 
+    def copy(self) -> 'Message':
+        """Envelope for a single receiver, it can change its fields without changing those of the other receivers.
+
+        Routes are immutable, so they are shared instead of copied. The destinations start empty, a receiver that
+        passes the message on always gets new ones from its routing.
+        """
+        envelope = copy(self)
+        envelope.destination = []
+        return envelope
+
     def before_message(self, message):
         if (self.start_time < message.start_time):
             return True
@@ -0,0 +1,164 @@
+from typing import List
+
+import numpy as np
+
+from host import Host
+
+
+class RandomWaypoint:
+    """The movement of Host.evaluate_moving: a node picks a point at most max_move / 2 away on both axes (within the
+    bounds) and goes there in a straight line over a random number of turns.
+    """
+
+    def __init__(self, max_move: float = 50, min_turns: int = 500, max_turns: int = 2000):
+        self.max_move = max_move
+        self.min_turns = min_turns
+        self.max_turns = max_turns
+
+    def pick(self, engine: 'MobilityEngine', picking: np.ndarray):
+        rng = engine.rng
+        min_x, min_y, max_x, max_y = engine.bounds
+        x = engine.x[picking]
+        y = engine.y[picking]
+
+        # Same integer targets as pick_next_move
+        x_lower = np.floor(np.maximum(x - self.max_move / 2, min_x))
+        x_upper = np.ceil(np.minimum(x + self.max_move / 2, max_x))
+        y_lower = np.floor(np.maximum(y - self.max_move / 2, min_y))
+        y_upper = np.ceil(np.minimum(y + self.max_move / 2, max_y))
+        new_x = rng.integers(x_lower, x_upper, endpoint=True)
+        new_y = rng.integers(y_lower, y_upper, endpoint=True)
+        turns = rng.integers(self.min_turns, self.max_turns, size=len(picking), endpoint=True)
+
+        engine.start_moves(picking, turns)
+        engine.dx[picking] = (new_x - x) / turns
+        engine.dy[picking] = (new_y - y) / turns
+
+
+class RandomWalk:
+    """A node walks in a random direction at a random speed for a random number of turns, bouncing off the edges."""
+
+    def __init__(self, min_speed: float = 0.01, max_speed: float = 0.05, min_turns: int = 500, max_turns: int = 2000):
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.min_turns = min_turns
+        self.max_turns = max_turns
+
+    def pick(self, engine: 'MobilityEngine', picking: np.ndarray):
+        rng = engine.rng
+        direction = rng.uniform(0, 2 * np.pi, size=len(picking))
+        speed = rng.uniform(self.min_speed, self.max_speed, size=len(picking))
+
+        engine.start_moves(picking, rng.integers(self.min_turns, self.max_turns, size=len(picking), endpoint=True))
+        engine.dx[picking] = speed * np.cos(direction)
+        engine.dy[picking] = speed * np.sin(direction)
+
+
+class MobilityEngine:
+    """Moves all nodes at once with array operations instead of one Host.evaluate_moving call per node.
+
+    Positions, velocities and remaining turns of all nodes are NumPy arrays. Every step the moving nodes advance by
+    their velocity, computed from the origin of their move like Host.evaluate_moving does, and every idle node starts a
+    new move with its movement_frequency as probability, as in Host.evaluate_moving; the model decides where it goes.
+    Only the nodes that moved get their new position written back to their Host, and only those that crossed into
+    another cell are moved in the spatial grid. The move of a Host (dx, dy, origin and turns) is updated when a node
+    gets a new trajectory, the remaining turns are counted down here. A bounce off an edge starts a new trajectory from
+    the point it bounced to. Random numbers come from NumPy, so runs are statistically the same as with evaluate_moving
+    but not identical.
+    """
+
+    def __init__(self, nodes: List[Host], model=None, bounds=(0, 0, 500, 500), seed: int = None):
+        self.nodes = nodes
+        self.model = model if model is not None else RandomWaypoint()
+        # min x, min y, max x, max y
+        self.bounds = bounds
+        self.rng = np.random.default_rng(seed)
+        # World whose spatial grid gets updated, registered by the simulator.
+        self.world = None
+
+        self.x = np.array([node.positionx for node in nodes], dtype=np.float64)
+        self.y = np.array([node.positiony for node in nodes], dtype=np.float64)
+        self.dx = np.array([node.dx for node in nodes], dtype=np.float64)
+        self.dy = np.array([node.dy for node in nodes], dtype=np.float64)
+        self.turns_remaining = np.array([node.move_turns_remaining for node in nodes], dtype=np.int64)
+        self.turns_total = np.array([node.move_turns_total for node in nodes], dtype=np.int64)
+        self.origin_x = np.array([node.move_origin_x for node in nodes], dtype=np.float64)
+        self.origin_y = np.array([node.move_origin_y for node in nodes], dtype=np.float64)
+        self.movement_frequency = np.array([node.movement_frequency for node in nodes], dtype=np.float64)
+
+    def step(self) -> np.ndarray:
+        """Moves all nodes a single round, returns the indexes of the nodes that got a new trajectory."""
+        moving = np.flatnonzero(self.turns_remaining >= 1)
+        idle = np.flatnonzero(self.turns_remaining < 1)
+        old_x = self.x[moving]
+        old_y = self.y[moving]
+
+        self.turns_remaining[moving] -= 1
+        moved = (self.turns_total[moving] - self.turns_remaining[moving]).astype(np.float64)
+        self.x[moving] = self.origin_x[moving] + moved * self.dx[moving]
+        self.y[moving] = self.origin_y[moving] + moved * self.dy[moving]
+
+        changed = self.bounce(moving)
+
+        # Nodes that ended up in another cell of the grid
+        grid = self.world.grid
+        cell_size = grid.cell_size
+        crossed = moving[(np.floor(old_x / cell_size) != np.floor(self.x[moving] / cell_size)) |
+                         (np.floor(old_y / cell_size) != np.floor(self.y[moving] / cell_size))]
+
+        picking = idle[self.rng.random(len(idle)) < self.movement_frequency[idle]]
+        if len(picking) > 0:
+            self.model.pick(self, picking)
+            changed = np.union1d(changed, picking)
+
+        nodes = self.nodes
+        for index, x, y in zip(moving.tolist(), self.x[moving].tolist(), self.y[moving].tolist()):
+            node = nodes[index]
+            node.positionx = x
+            node.positiony = y
+        for index in crossed.tolist():
+            node = nodes[index]
+            grid.move(node, node.positionx, node.positiony)
+
+        # Keep the trajectories of the hosts up to date as well
+        for index, dx, dy, turns, origin_x, origin_y in zip(
+                changed.tolist(), self.dx[changed].tolist(), self.dy[changed].tolist(),
+                self.turns_remaining[changed].tolist(), self.origin_x[changed].tolist(),
+                self.origin_y[changed].tolist()):
+            node = nodes[index]
+            node.dx = dx
+            node.dy = dy
+            node.move_turns_remaining = turns
+            node.move_turns_total = turns
+            node.move_origin_x = origin_x
+            node.move_origin_y = origin_y
+
+        return changed
+
+    def set_world(self, world):
+        self.world = world
+
+    def start_moves(self, indexes: np.ndarray, turns: np.ndarray):
+        """The nodes start a new move of the given number of turns from where they are now."""
+        self.turns_remaining[indexes] = turns
+        self.turns_total[indexes] = turns
+        self.origin_x[indexes] = self.x[indexes]
+        self.origin_y[indexes] = self.y[indexes]
+
+    def bounce(self, moving: np.ndarray) -> np.ndarray:
+        """Reflects the nodes that moved past an edge back inside, returns the ones that changed direction."""
+        min_x, min_y, max_x, max_y = self.bounds
+        x = self.x[moving]
+        y = self.y[moving]
+        out_x = (x < min_x) | (x > max_x)
+        out_y = (y < min_y) | (y > max_y)
+        if not out_x.any() and not out_y.any():
+            return np.zeros(0, dtype=np.int64)
+
+        self.x[moving] = np.where(x < min_x, 2 * min_x - x, np.where(x > max_x, 2 * max_x - x, x))
+        self.y[moving] = np.where(y < min_y, 2 * min_y - y, np.where(y > max_y, 2 * max_y - y, y))
+        self.dx[moving[out_x]] *= -1
+        self.dy[moving[out_y]] *= -1
+        bounced = moving[out_x | out_y]
+        self.start_moves(bounced, self.turns_remaining[bounced])
+        return bounced
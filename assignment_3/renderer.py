@@ -0,0 +1,109 @@
+import random
+import threading
+import tkinter as tk
+from time import perf_counter
+from typing import List
+
+from host import Host
+
+
+class TkRenderer:
+    """Draws the nodes and the links they are sending over in a tkinter window, without slowing down the simulation.
+
+    The simulation and the window run separately: the simulator calls render after every round, which only takes a
+    snapshot of the positions and links when the previous one is at least a frame old and otherwise returns right
+    away. The window draws the latest snapshot on a timer in the Tk thread, rounds in between are skipped. Every node
+    has one dot and one line on the canvas that are moved with coords() and hidden when not sending, instead of being
+    deleted and created again.
+
+    Colors come from an own random generator, so watching a run draws nothing from the random numbers of the
+    simulation and gives the same results as running it headless.
+    """
+
+    def __init__(self, nodes: List[Host], fps: float = 30, width: int = 510, height: int = 510, seed: int = None):
+        self.nodes = nodes
+        self.index_of = {node: index for index, node in enumerate(nodes)}
+        self.frame_interval = 1 / fps
+        self.next_frame = 0.0
+        # Latest (round, positions, link per node) taken by render, replaced as a whole so the Tk thread can read it.
+        self.snapshot = None
+        self.drawn_snapshot = None
+
+        self.window = tk.Tk()
+        self.window.title("Routing simulator")
+        self.canvas = tk.Canvas(self.window, width=width, height=height)
+        self.canvas.configure(background="grey")
+        self.canvas.pack()
+
+        self.colors = random.Random(seed)
+        self.dots = [self.create_dot(node) for node in nodes]
+        self.lines = [self.canvas.create_line(0, 0, 0, 0, fill='green', width=3, state='hidden') for _ in nodes]
+        self.visible_lines = set()
+
+    def create_dot(self, node: Host):
+        fill_color = "#{:02x}{:02x}{:02x}".format(
+            self.colors.randint(0, 255),
+            self.colors.randint(0, 255),
+            self.colors.randint(0, 255)
+        )
+
+        return self.canvas.create_oval(node.positionx-5, node.positiony-5, node.positionx+5, node.positiony+5,
+                                       fill=fill_color)
+
+    def render(self, round_counter: int, nodes: List[Host]):
+        """Called by the simulator every round, takes a snapshot at most once per frame."""
+        now = perf_counter()
+        if now < self.next_frame:
+            return
+        self.next_frame = now + self.frame_interval
+
+        positions = [(node.positionx, node.positiony) for node in nodes]
+        links = [self.index_of.get(node.active_link, -1) for node in nodes]
+        self.snapshot = (round_counter, positions, links)
+
+    def draw(self):
+        snapshot = self.snapshot
+        if snapshot is None or snapshot is self.drawn_snapshot:
+            return
+        self.drawn_snapshot = snapshot
+
+        round_counter, positions, links = snapshot
+        for index, (x, y) in enumerate(positions):
+            self.canvas.coords(self.dots[index], x-5, y-5, x+5, y+5)
+
+            destination = links[index]
+            if destination >= 0:
+                destination_x, destination_y = positions[destination]
+                self.canvas.coords(self.lines[index], x, y, destination_x, destination_y)
+                if index not in self.visible_lines:
+                    self.canvas.itemconfigure(self.lines[index], state='normal')
+                    self.visible_lines.add(index)
+            elif index in self.visible_lines:
+                self.canvas.itemconfigure(self.lines[index], state='hidden')
+                self.visible_lines.discard(index)
+
+        self.window.title(f"Routing simulator, round {round_counter}")
+
+    def run(self, sim):
+        """Runs the simulator loop in a background thread and the window in this one, returns when the loop is done.
+
+        Tk has to be used from the thread that created it, so the simulation gets the other thread. It only ever hands
+        over snapshots, the window can't hold it up.
+        """
+        thread = threading.Thread(target=sim.begin_loop, daemon=True)
+
+        def tick():
+            self.draw()
+            if thread.is_alive():
+                self.window.after(int(self.frame_interval * 1000), tick)
+            else:
+                # Show where everything ended up
+                self.next_frame = 0.0
+                self.render(sim.counter, self.nodes)
+                self.draw()
+                self.window.quit()
+
+        thread.start()
+        self.window.after(0, tick)
+        self.window.mainloop()
+        thread.join()
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from typing import Optional
+
+from message import Route
+
+
+class RouteCache:
+    """Routes learned by DSR, keyed by their destination.
+
+    Only the first route found to a destination is kept, like before, until it gets evicted. A route is evicted when
+    it is older than max_age rounds, when the cache is full and it is the least recently used one, or when it gets
+    invalidated because one of its hops went out of reach.
+    """
+
+    def __init__(self, max_routes: int = 100, max_age: int = 2000):
+        self.max_routes = max_routes
+        self.max_age = max_age
+        # Destination -> (route, round it was learned), least recently used first.
+        self.routes: OrderedDict = OrderedDict()
+
+    def get(self, destination, round_counter: int) -> Optional[Route]:
+        entry = self.routes.get(destination)
+        if entry is None:
+            return None
+
+        route, learned = entry
+        if round_counter - learned > self.max_age:
+            del self.routes[destination]
+            return None
+        self.routes.move_to_end(destination)
+        return route
+
+    def add(self, destination, route: Route, round_counter: int) -> bool:
+        """Remembers the route unless there already is one to the destination, returns whether it did."""
+        entry = self.routes.get(destination)
+        if entry is not None and round_counter - entry[1] <= self.max_age:
+            return False
+
+        self.routes.pop(destination, None)
+        self.routes[destination] = (route, round_counter)
+        if len(self.routes) > self.max_routes:
+            self.routes.popitem(last=False)
+        return True
+
+    def invalidate(self, destination):
+        self.routes.pop(destination, None)
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+
+class SeenIds:
+    """Set of the ids that were added recently, bounded in size and optionally in age.
+
+    The oldest ids are forgotten first, once there are more than capacity or when they were added more than max_age
+    rounds ago.
+    """
+
+    def __init__(self, capacity: int = 1000, max_age: int = None):
+        self.capacity = capacity
+        self.max_age = max_age
+        # Id -> round it was added, used as an insertion ordered set.
+        self.ids: OrderedDict = OrderedDict()
+
+    def add(self, message_id, round_counter: int = 0) -> bool:
+        """Adds the id, returns False when it was already seen."""
+        if self.max_age is not None:
+            while len(self.ids) > 0 and round_counter - next(iter(self.ids.values())) > self.max_age:
+                self.ids.popitem(last=False)
+
+        if message_id in self.ids:
+            return False
+        self.ids[message_id] = round_counter
+        if len(self.ids) > self.capacity:
+            self.ids.popitem(last=False)
+        return True
+
+    def __contains__(self, message_id) -> bool:
+        return message_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
@@ -1,10 +1,14 @@
 import math
+import random
 import sys
 from time import sleep
 from typing import Dict, List, TextIO
 
+import checkpoint
 from host import Host
 from message import Message
+from profiler import PhaseProfiler
+from world import World
 
 
 class simulator:
@@ -13,46 +17,138 @@ class simulator:
     timeout: int = sys.maxsize
     message_id = 0
 
-    def __init__(self, nodes, timeout, tkinter_window, canvas, node_dict):
+    def __init__(self, nodes, timeout, renderer=None, profiler: PhaseProfiler = None, mobility=None, tracker=None):
         self.nodes = nodes
         self.timeout = timeout
-        self.tkinter_window = tkinter_window
-        self.canvas = canvas
-        self.node_dict = node_dict
-        self.message_line_dict = {}
-        node: Host
-        for node in nodes:
-            self.message_line_dict[node] = {}
+        # Registry of the nodes of this simulation only, hosts search their neighbors and destinations in it.
+        self.world = World(nodes)
+        # Observer that gets to draw the nodes after every round, without one the simulator runs headless.
+        # It needs a render(round_counter, nodes) method, see renderer.TkRenderer.
+        self.renderer = renderer
+        # Measures the time spent per phase of the loop when given, the breakdown gets printed at the end.
+        self.profiler = profiler
+        # Moves all nodes at once when given (see mobility.MobilityEngine), otherwise every node moves itself.
+        self.mobility = mobility
+        if mobility is not None:
+            mobility.set_world(self.world)
+        # Keeps the neighbors of all nodes up to date from predicted link changes when given (see
+        # kinetic.KineticNeighborTracker), otherwise every node searches for its neighbors when it needs them.
+        self.tracker = tracker
+        if tracker is not None:
+            for node in nodes:
+                node.tracker = tracker
+        # Random state of a paused run or a restored snapshot, set at the start of the next begin_loop.
+        self.random_state = None
 
-    def begin_loop(self):
+    def begin_loop(self, until: int = None):
+        """Runs the simulation up to the timeout, or when until is given only the rounds before that one.
+
+        Calling it again continues where it stopped, which also works on a simulator restored from a snapshot.
+        """
+        limit = self.timeout if until is None else min(until, self.timeout)
+        if self.random_state is not None:
+            random.setstate(self.random_state)
+            self.random_state = None
 
         print("Starting simulator...")
         if len(self.nodes) <= 0:
             print('No nodes registered so simulating nothing')
             return
 
-        while self.counter < self.timeout:
+        profiler = self.profiler
+        loop_started = PhaseProfiler.start() if profiler is not None else None
+        while self.counter < limit:
             # Progress bar
             simulator.print_progress_bar(self.counter, self.timeout)
 
+            if self.tracker is not None:
+                started = PhaseProfiler.start() if profiler is not None else None
+                self.tracker.advance(self.counter)
+                if profiler is not None:
+                    profiler.stop("neighbors", started)
+
             # Main loop to let nodes do their thing
+            started = PhaseProfiler.start() if profiler is not None else None
             node: Host
             for node in self.nodes:
-                self.message_id = node.evaluate_round(self.counter, self.canvas, self.message_id)
+                self.message_id = node.evaluate_round(self.counter, self.message_id)
+            if profiler is not None:
+                profiler.stop("evaluate", started)
+                started = PhaseProfiler.start()
 
             # Main loop for letting the nodes move around
-            for node in self.nodes:
-                node.evaluate_moving()
-                self.canvas.move(self.node_dict[node], node.dx, node.dy)
+            # Nodes that picked a new trajectory let the tracker know, from the next round on it's different.
+            if self.mobility is not None:
+                changed = self.mobility.step()
+                if self.tracker is not None:
+                    for index in changed.tolist():
+                        self.tracker.trajectory_changed(self.mobility.nodes[index], self.counter)
+            else:
+                for node in self.nodes:
+                    if node.evaluate_moving() and self.tracker is not None:
+                        self.tracker.trajectory_changed(node, self.counter)
+            if profiler is not None:
+                profiler.stop("move", started)
 
-            self.tkinter_window.update_idletasks()
-            self.tkinter_window.update()
+            if self.renderer is not None:
+                started = PhaseProfiler.start() if profiler is not None else None
+                self.renderer.render(self.counter, self.nodes)
+                if profiler is not None:
+                    profiler.stop("render", started)
 
             self.counter = self.counter + 1
 
+        if self.counter < self.timeout:
+            if profiler is not None:
+                profiler.stop("loop", loop_started)
+            # Whatever uses the random module until this one continues, a fork included, doesn't change its run.
+            self.random_state = random.getstate()
+            print('Paused simulating at round %d' % self.counter)
+            return
+
         print('Done simulating, ran for %d iterations' % self.counter)
+        if profiler is not None:
+            profiler.stop("loop", loop_started)
+            profiler.print_report()
         return
 
+    def snapshot(self) -> bytes:
+        """The full state of the simulation: nodes, their messages and routes, movement, metrics and random state.
+
+        Take it between calls of begin_loop, restore gives back a simulator that continues exactly where this one is.
+        The renderer is left out, a restored simulator runs headless until it gets a new one.
+        """
+        # A paused or restored simulator continues from its own random state
+        random_state = self.random_state if self.random_state is not None else random.getstate()
+        return checkpoint.dumps({'simulator': self, 'random_state': random_state}, self.nodes)
+
+    @staticmethod
+    def restore(snapshot: bytes) -> 'simulator':
+        """Simulator from a snapshot, its random state gets set when begin_loop continues it."""
+        state = checkpoint.loads(snapshot)
+        restored: simulator = state['simulator']
+        restored.random_state = state['random_state']
+        return restored
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            file.write(self.snapshot())
+
+    @staticmethod
+    def load(path: str) -> 'simulator':
+        with open(path, 'rb') as file:
+            return simulator.restore(file.read())
+
+    def fork(self) -> 'simulator':
+        """Independent copy of this simulator from its current round, for example to continue with other traffic."""
+        return simulator.restore(self.snapshot())
+
+    def __getstate__(self):
+        # Windows can't be pickled
+        state = self.__dict__.copy()
+        state['renderer'] = None
+        return state
+
     def print_results(self):
         """Method that prints results of the simulator
 
@@ -0,0 +1,93 @@
+import math
+from typing import Dict, Tuple
+
+
+class SpatialGrid:
+    """Uniform grid that buckets hosts by position so neighbor queries only look at nearby hosts.
+
+    The plane is cut into square cells as large as the largest reach of the inserted hosts, all hosts are put in new
+    cells when one with a larger reach comes in. A query for everything within the reach of a host then only has to
+    look at the cells overlapping the square around it, at most a 3x3 block. A larger query looks at the occupied
+    cells instead when there are fewer of those than cells in its square. Every World has its own grid over just
+    its nodes.
+    """
+
+    def __init__(self, cell_size: float = None):
+        # With a cell size given it stays fixed, else it follows the largest reach.
+        self.cell_size = cell_size
+        self.fixed = cell_size is not None
+        # Cell coordinates -> hosts in that cell, a dict is used as an insertion ordered set.
+        self.cells: Dict[Tuple[int, int], Dict[object, None]] = {}
+        self.cell_of: Dict[object, Tuple[int, int]] = {}
+
+    def get_cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, host, x: float, y: float, reach: float):
+        if self.cell_size is None:
+            self.cell_size = reach if reach > 0 else 1
+        elif reach > self.cell_size and not self.fixed:
+            self.resize(reach)
+
+        cell = self.get_cell(x, y)
+        self.cells.setdefault(cell, {})[host] = None
+        self.cell_of[host] = cell
+
+    def resize(self, cell_size: float):
+        # The cells only remember the hosts, so their positions are asked back.
+        hosts = list(self.cell_of)
+        self.cell_size = cell_size
+        self.cells = {}
+        self.cell_of = {}
+        for host in hosts:
+            cell = self.get_cell(host.positionx, host.positiony)
+            self.cells.setdefault(cell, {})[host] = None
+            self.cell_of[host] = cell
+
+    def move(self, host, x: float, y: float):
+        old_cell = self.cell_of.get(host)
+        new_cell = self.get_cell(x, y)
+
+        # Most moves stay inside the same cell, nothing to do then.
+        if old_cell == new_cell:
+            return
+
+        if old_cell is not None:
+            self.discard(host, old_cell)
+        self.cells.setdefault(new_cell, {})[host] = None
+        self.cell_of[host] = new_cell
+
+    def remove(self, host):
+        cell = self.cell_of.get(host)
+        if cell is not None:
+            self.discard(host, cell)
+
+    def discard(self, host, cell: Tuple[int, int]):
+        bucket = self.cells[cell]
+        del bucket[host]
+        if len(bucket) == 0:
+            del self.cells[cell]
+        del self.cell_of[host]
+
+    def query(self, x: float, y: float, radius: float):
+        """Yields all hosts in the cells overlapping the square of size 2 * radius around (x, y).
+
+        This is a superset of the hosts within the radius, the caller still has to check the actual distance.
+        """
+        if self.cell_size is None:
+            return
+
+        min_cell_x, min_cell_y = self.get_cell(x - radius, y - radius)
+        max_cell_x, max_cell_y = self.get_cell(x + radius, y + radius)
+
+        if (max_cell_x - min_cell_x + 1) * (max_cell_y - min_cell_y + 1) > len(self.cells):
+            for (cell_x, cell_y), bucket in self.cells.items():
+                if min_cell_x <= cell_x <= max_cell_x and min_cell_y <= cell_y <= max_cell_y:
+                    yield from bucket
+            return
+
+        for cell_x in range(min_cell_x, max_cell_x + 1):
+            for cell_y in range(min_cell_y, max_cell_y + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket is not None:
+                    yield from bucket
@@ -0,0 +1,50 @@
+import random
+from typing import Dict, List
+
+from spatial_index import SpatialGrid
+
+
+class World:
+    """Registry of the nodes of a single simulation, every simulator owns one.
+
+    Nodes are kept in a list in the order they were added, so they can be looked up by index and a random one can be
+    picked in O(1), next to a spatial grid over just these nodes for neighbor searches. Nothing is shared between
+    worlds, so several simulations can run in the same process without seeing each other's nodes.
+    """
+
+    def __init__(self, nodes: List = ()):
+        self.nodes: List = []
+        self.index_of: Dict = {}
+        self.grid = SpatialGrid()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        if node in self.index_of:
+            return
+        self.index_of[node] = len(self.nodes)
+        self.nodes.append(node)
+        self.grid.insert(node, node.positionx, node.positiony, node.reach)
+        node.set_world(self)
+
+    def remove(self, node):
+        """Removes the node in O(1) by moving the last node into its place, which changes the index of that one."""
+        index = self.index_of.pop(node)
+        last = self.nodes.pop()
+        if last is not node:
+            self.nodes[index] = last
+            self.index_of[last] = index
+        self.grid.remove(node)
+        node.set_world(None)
+
+    def random_node(self, rng: random.Random = random):
+        return rng.choice(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __contains__(self, node) -> bool:
+        return node in self.index_of
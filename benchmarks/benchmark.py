@@ -0,0 +1,248 @@
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+# Both assignments have modules called simulator and host, so every case runs in its own process with the path of
+# its assignment. That also makes the peak memory of a case its own.
+REPOSITORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROTOCOLS = {'assignment_2': ['aloha', 'smac', 'aloha_vectorized'],
+             'assignment_3': ['broadcast', 'dsr']}
+
+# Node counts, average neighbours and rounds per assignment. Assignment 3 moves nodes every round and samples a random
+# destination from all nodes for every message, so it is run over shorter horizons.
+GRIDS = {
+    'quick': {'assignment_2': {'nodes': [10, 100, 1000], 'densities': [5], 'horizons': [2000]},
+              'assignment_3': {'nodes': [10, 100, 1000], 'densities': [5], 'horizons': [200]}},
+    'full': {'assignment_2': {'nodes': [10, 100, 1000, 10000], 'densities': [5, 20], 'horizons': [2000, 10000]},
+             'assignment_3': {'nodes': [10, 100, 1000, 10000], 'densities': [5, 20], 'horizons': [200, 1000]}},
+}
+
+# Side of the square the nodes are placed in, assignment 3 nodes move within 0 to 500.
+AREA_SIDE = {'assignment_2': 800, 'assignment_3': 500}
+
+
+def make_cases(grid: str, assignments: List[str], protocols: List[str] = None, seed: int = 1) -> List[Dict]:
+    cases = []
+    for assignment in assignments:
+        parameters = GRIDS[grid][assignment]
+        for protocol, density, horizon, number_of_nodes in itertools.product(
+                PROTOCOLS[assignment], parameters['densities'], parameters['horizons'], parameters['nodes']):
+            if protocols is not None and protocol not in protocols:
+                continue
+            cases.append({'assignment': assignment, 'protocol': protocol, 'nodes': number_of_nodes,
+                          'density': density, 'horizon': horizon, 'seed': seed})
+    return cases
+
+
+def case_key(case: Dict) -> str:
+    return f"{case['assignment']}/{case['protocol']}/n={case['nodes']}/d={case['density']}/t={case['horizon']}"
+
+
+def layout_for(case: Dict) -> List:
+    """Random (x, y, reach) for every node, the reach is chosen so a node has density neighbours on average."""
+    side = AREA_SIDE[case['assignment']]
+    reach = max(1.0, math.sqrt(case['density'] * side * side / (math.pi * case['nodes'])))
+    random.seed(case['seed'])
+    return [(random.randint(0, side), random.randint(0, side), reach) for _ in range(case['nodes'])]
+
+
+def run_assignment_2(case: Dict) -> Dict:
+    sys.path.insert(0, os.path.join(REPOSITORY_PATH, 'assignment_2'))
+    from simulator import simulator
+    from sweep import build_nodes
+
+    layout = layout_for(case)
+    if case['protocol'] == 'aloha_vectorized':
+        from vectorized_aloha import simulate_aloha
+        started = time.perf_counter()
+        stats = simulate_aloha(layout, case['horizon'], 10, [100, 200], seed=case['seed'])
+        return {'time': time.perf_counter() - started, 'stats': stats}
+
+    nodes = build_nodes(layout, case['protocol'], 10, [100, 200])
+    random.seed(case['seed'])
+    sim = simulator(nodes, case['horizon'], event_driven=True, trace_path=None)
+    started = time.perf_counter()
+    sim.begin_loop()
+    elapsed = time.perf_counter() - started
+    return {'time': elapsed, 'stats': sim.get_stats()}
+
+
+def run_assignment_3(case: Dict) -> Dict:
+    sys.path.insert(0, REPOSITORY_PATH)
+    sys.path.insert(0, os.path.join(REPOSITORY_PATH, 'assignment_3'))
+    from assignment_3.dsr_routing import dsr_routing
+    from broadcast_routing import broadcast_routing
+    from host import Host
+    from simulator import simulator
+
+    routing_algorithm = dsr_routing if case['protocol'] == 'dsr' else broadcast_routing
+    nodes = [Host(id, x, y, reach, routing_algorithm, 0.2, 0.5) for id, (x, y, reach) in enumerate(layout_for(case))]
+    random.seed(case['seed'])
+    # Headless, without a renderer
+    sim = simulator(nodes, case['horizon'])
+    started = time.perf_counter()
+    sim.begin_loop()
+    elapsed = time.perf_counter() - started
+
+    totals = {}
+    for node in nodes:
+        for name, value in node.metrics.items():
+            totals[name] = totals.get(name, 0) + value
+    return {'time': elapsed, 'stats': totals}
+
+
+def run_case(case: Dict) -> Dict:
+    """Runs a single case in this process, meant to be called in a fresh process through run_case_process."""
+    memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if case['assignment'] == 'assignment_2':
+            result = run_assignment_2(case)
+        else:
+            result = run_assignment_3(case)
+    # Linux reports the maximum resident set size in kilobytes
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {'case': case, 'status': 'ok', 'time': result['time'],
+            'rounds_per_second': case['horizon'] / result['time'] if result['time'] > 0 else None,
+            'peak_memory_kb': peak_memory, 'memory_growth_kb': peak_memory - memory_before, 'stats': result['stats']}
+
+
+def run_case_process(case: Dict, timeout: float) -> Dict:
+    try:
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+                                 capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'case': case, 'status': 'timeout'}
+
+    if process.returncode != 0:
+        return {'case': case, 'status': 'error', 'error': process.stderr.strip().splitlines()[-1:]}
+    return json.loads(process.stdout)
+
+
+def scaling_exponents(results: List[Dict]) -> Dict[str, float]:
+    """Least squares slope of log(time) against log(nodes) for every series of cases that only differ in node count.
+
+    An exponent of 1 means the run time grows linearly with the number of nodes, 2 quadratically.
+    """
+    series: Dict[str, List] = {}
+    for result in results:
+        if result['status'] != 'ok' or result['time'] <= 0:
+            continue
+        case = result['case']
+        key = f"{case['assignment']}/{case['protocol']}/d={case['density']}/t={case['horizon']}"
+        series.setdefault(key, []).append((math.log(case['nodes']), math.log(result['time'])))
+
+    exponents = {}
+    for key, points in series.items():
+        if len(points) < 2:
+            continue
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        variance = sum((x - mean_x) ** 2 for x, _ in points)
+        if variance > 0:
+            exponents[key] = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+    return exponents
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPOSITORY_PATH, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[Dict]:
+    """Rounds per second of every case against the same case in the baseline.
+
+    A case counts as a regression when it is more than tolerance (a fraction) slower than in the baseline.
+    """
+    baseline_results = {case_key(result['case']): result for result in baseline['results'] if result['status'] == 'ok'}
+    comparisons = []
+    for result in results:
+        key = case_key(result['case'])
+        old = baseline_results.get(key)
+        if result['status'] != 'ok' or old is None:
+            continue
+        speedup = result['rounds_per_second'] / old['rounds_per_second']
+        comparisons.append({'case': key, 'speedup': speedup,
+                            'memory_ratio': result['peak_memory_kb'] / old['peak_memory_kb'],
+                            'regression': speedup < 1 - tolerance})
+    return comparisons
+
+
+def print_results(results: List[Dict], exponents: Dict[str, float], comparisons: List[Dict]):
+    print(f"{'case':<52}{'time (s)':>10}{'rounds/s':>12}{'peak MB':>10}")
+    for result in results:
+        if result['status'] != 'ok':
+            print(f"{case_key(result['case']):<52}{result['status']:>10}")
+            continue
+        print(f"{case_key(result['case']):<52}{result['time']:>10.3f}{result['rounds_per_second']:>12.1f}"
+              f"{result['peak_memory_kb'] / 1024:>10.1f}")
+
+    if len(exponents) > 0:
+        print("\nScaling exponents of the run time in the number of nodes")
+        for key, exponent in exponents.items():
+            print(f"{key:<52}{exponent:>10.2f}")
+
+    if len(comparisons) > 0:
+        print("\nAgainst the baseline")
+        for comparison in comparisons:
+            flag = "  REGRESSION" if comparison['regression'] else ""
+            print(f"{comparison['case']:<52}{comparison['speedup']:>9.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmarks of the assignment 2 and 3 simulators")
+    parser.add_argument('--grid', choices=sorted(GRIDS), default='quick')
+    parser.add_argument('--assignment', action='append', choices=sorted(PROTOCOLS),
+                        help="assignments to run, all by default")
+    parser.add_argument('--protocol', action='append', help="protocols to run, all by default")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=600, help="seconds a single case may take")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="earlier output to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="fraction a case may be slower than the baseline before it counts as a regression")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.case is not None:
+        print(json.dumps(run_case(json.loads(arguments.case))))
+        return
+
+    cases = make_cases(arguments.grid, arguments.assignment or sorted(PROTOCOLS), arguments.protocol, arguments.seed)
+    results = []
+    for case in cases:
+        print(f"Running {case_key(case)}", file=sys.stderr)
+        results.append(run_case_process(case, arguments.timeout))
+
+    exponents = scaling_exponents(results)
+    comparisons = []
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as file:
+            comparisons = compare(results, json.load(file), arguments.tolerance)
+
+    with open(arguments.output, 'w') as file:
+        json.dump({'commit': git_commit(), 'created': time.time(), 'python': platform.python_version(),
+                   'platform': platform.platform(), 'grid': arguments.grid, 'results': results,
+                   'scaling_exponents': exponents, 'comparisons': comparisons}, file, indent=2)
+
+    print_results(results, exponents, comparisons)
+    if any(comparison['regression'] for comparison in comparisons):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
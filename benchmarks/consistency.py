@@ -0,0 +1,136 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+from typing import Dict, List
+
+from benchmark import REPOSITORY_PATH, layout_for
+
+# Fixed seed cases for the claims the optimizations rest on: the event driven loop of assignment 2 gives the same
+# get_stats as the round based one, and the kinetic tracker of assignment 3 gives the same neighbors as a search over
+# all nodes every round. Like the benchmarks, every case runs in its own process with the path of its assignment.
+CASES = [{'check': 'event_driven', 'assignment': 'assignment_2', 'protocol': protocol, 'nodes': number_of_nodes,
+          'density': density, 'horizon': 5000, 'seed': 1}
+         for protocol in ('aloha', 'smac') for number_of_nodes in (10, 100) for density in (5, 20)]
+CASES += [{'check': 'kinetic', 'assignment': 'assignment_3', 'mobility': mobility, 'nodes': number_of_nodes,
+           'density': 5, 'horizon': 300, 'seed': 1}
+          for mobility in ('host', 'engine') for number_of_nodes in (30, 100)]
+
+
+def case_key(case: Dict) -> str:
+    if case['check'] == 'event_driven':
+        return f"event_driven/{case['protocol']}/n={case['nodes']}/d={case['density']}/t={case['horizon']}"
+    return f"kinetic/{case['mobility']}/n={case['nodes']}/d={case['density']}/t={case['horizon']}"
+
+
+def check_event_driven(case: Dict) -> Dict:
+    """get_stats of the round based and the event driven loop on the same layout and seed."""
+    sys.path.insert(0, os.path.join(REPOSITORY_PATH, 'assignment_2'))
+    from simulator import simulator
+    from sweep import build_nodes
+
+    layout = layout_for(case)
+    stats = {}
+    for event_driven in (False, True):
+        nodes = build_nodes(layout, case['protocol'], 10, [100, 200])
+        random.seed(case['seed'])
+        sim = simulator(nodes, case['horizon'], event_driven=event_driven, trace_path=None)
+        sim.begin_loop()
+        stats['event_driven' if event_driven else 'rounds'] = sim.get_stats()
+
+    return {'equal': stats['rounds'] == stats['event_driven'], 'stats': stats}
+
+
+def check_kinetic(case: Dict) -> Dict:
+    """Neighbors of the kinetic tracker against a search over all nodes, in every round of the horizon."""
+    sys.path.insert(0, REPOSITORY_PATH)
+    sys.path.insert(0, os.path.join(REPOSITORY_PATH, 'assignment_3'))
+    from assignment_3.dsr_routing import dsr_routing
+    from host import Host
+    from kinetic import KineticNeighborTracker
+    from mobility import MobilityEngine, RandomWalk
+    from simulator import simulator
+
+    nodes = [Host(id, x, y, reach, dsr_routing, 0.2, 0.5) for id, (x, y, reach) in enumerate(layout_for(case))]
+    random.seed(case['seed'])
+    tracker = KineticNeighborTracker(nodes)
+    mobility = MobilityEngine(nodes, RandomWalk(), seed=case['seed']) if case['mobility'] == 'engine' else None
+    sim = simulator(nodes, case['horizon'], mobility=mobility, tracker=tracker)
+
+    first_mismatch = None
+    link_changes = 0
+    previous = None
+    for round_counter in range(1, case['horizon']):
+        # Pause before the round, the tracker then gets advanced to it just like the loop does
+        sim.begin_loop(until=round_counter)
+        tracker.advance(round_counter)
+        tracked = [[neighbor.mac for neighbor in tracker.get_neighbors(node)] for node in nodes]
+        searched = [[other.mac for other in nodes if node.is_reacheable(other)] for node in nodes]
+        if tracked != searched and first_mismatch is None:
+            first_mismatch = round_counter
+        if previous is not None:
+            link_changes += sum(len(set(old) ^ set(new)) for old, new in zip(previous, searched))
+        previous = searched
+
+    # Without any link coming up or going down the comparison would not say much
+    return {'equal': first_mismatch is None, 'first_mismatch': first_mismatch, 'link_changes': link_changes}
+
+
+def run_case(case: Dict) -> Dict:
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if case['check'] == 'event_driven':
+            result = check_event_driven(case)
+        else:
+            result = check_kinetic(case)
+    return {'case': case, 'status': 'ok' if result['equal'] else 'mismatch', **result}
+
+
+def run_case_process(case: Dict, timeout: float) -> Dict:
+    try:
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+                                 capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'case': case, 'status': 'timeout'}
+
+    if process.returncode != 0:
+        return {'case': case, 'status': 'error', 'error': process.stderr.strip().splitlines()[-1:]}
+    return json.loads(process.stdout)
+
+
+def print_results(results: List[Dict]):
+    for result in results:
+        detail = ""
+        if result.get('first_mismatch') is not None:
+            detail = f"  first differs in round {result['first_mismatch']}"
+        elif 'link_changes' in result:
+            detail = f"  {result['link_changes']} link changes"
+        elif result['status'] == 'error':
+            detail = f"  {result['error']}"
+        print(f"{case_key(result['case']):<52}{result['status']:>10}{detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks that the faster simulation paths give the same results")
+    parser.add_argument('--timeout', type=float, default=600, help="seconds a single case may take")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.case is not None:
+        print(json.dumps(run_case(json.loads(arguments.case))))
+        return
+
+    results = []
+    for case in CASES:
+        print(f"Checking {case_key(case)}", file=sys.stderr)
+        results.append(run_case_process(case, arguments.timeout))
+
+    print_results(results)
+    if any(result['status'] != 'ok' for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()